@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+
+from argparse import ArgumentParser
+import sys
+
+from ntfs_parse.pipeline import run_pipeline, SINKS
+
+
+def parse_args(argument_string):
+    parser = ArgumentParser(prog='./full_run.py')
+    parser.add_argument('-i',
+                        help='raw image file',
+                        dest='image',
+                        required=True)
+
+    # group of offset parameters
+    o_group = parser.add_mutually_exclusive_group()
+    o_group.add_argument('-o',
+                         help='Offset into the image for the filesystem, in sectors',
+                         dest='offset_sectors',
+                         type=int)
+    o_group.add_argument('-O',
+                         help='Offset into the image for the filesystem, in bytes',
+                         dest='offset_bytes',
+                         type=int)
+    parser.add_argument('-s',
+                        help='sector size (default=%(default)s)',
+                        default=512,
+                        type=int,
+                        dest='sector_size')
+
+    parser.add_argument('-e',
+                        help='Directory for the output files. Default=\'.\'',
+                        default='.',
+                        dest='directory')
+    parser.add_argument('-t',
+                        help='Outputs to make, can be given more than once. Default=all',
+                        choices=list(SINKS),
+                        action='append',
+                        dest='sinks')
+    parser.add_argument('-d',
+                        help='Directory for dumping incomplete parsed pages. Output in directory is full binary RCRD '
+                             'page of 4096 bytes. Default=\'./errorpages\'',
+                        default='errorpages',
+                        dest='dump_dir')
+    parser.add_argument('-w',
+                        help='Number of worker processes, MFT, LogFile and UsnJrnl each get one. Default=%(default)s',
+                        default=3,
+                        type=int,
+                        dest='workers')
+    parser.add_argument('--full-path',
+                        help='Add a column with the full path of every entry to the MFT csv',
+                        action='store_true',
+                        dest='full_path')
+    return parser.parse_args(argument_string)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+
+    run_pipeline(image_name=args.image,
+                 offset_sectors=args.offset_sectors,
+                 offset_bytes=args.offset_bytes,
+                 sector_size=args.sector_size,
+                 directory=args.directory,
+                 sinks=args.sinks or list(SINKS),
+                 workers=args.workers,
+                 dump_dir=args.dump_dir,
+                 full_path=args.full_path)
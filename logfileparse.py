@@ -5,13 +5,34 @@ import sys
 
 from time import process_time
 from ntfs_parse import LogFile
+from ntfs_parse import BootSector
 
 
 def parse_args(argument_string):
     parser = ArgumentParser(prog='./logfileparse.py')
-    parser.add_argument('-f',
-                        help='extracted $DATA attribute of the $MFT $LogFile entry',
-                        dest='file_name')
+    input_group = parser.add_mutually_exclusive_group()
+    input_group.add_argument('-f',
+                             help='extracted $DATA attribute of the $MFT $LogFile entry',
+                             dest='file_name')
+    input_group.add_argument('-i',
+                             help='raw image file, the $LogFile is read from it directly',
+                             dest='image')
+
+    # group of offset parameters, for reading straight from an image
+    o_group = parser.add_mutually_exclusive_group()
+    o_group.add_argument('-o',
+                         help='Offset into the image for the filesystem, in sectors',
+                         dest='offset_sectors',
+                         type=int)
+    o_group.add_argument('-O',
+                         help='Offset into the image for the filesystem, in bytes',
+                         dest='offset_bytes',
+                         type=int)
+    parser.add_argument('-s',
+                        help='sector size (default=%(default)s)',
+                        default=512,
+                        type=int,
+                        dest='sector_size')
     parser.add_argument('-e',
                         help='Name of destination file. If left out, stdout is used. Existing files will be overwritten.',
                         dest='export_file')
@@ -35,20 +56,43 @@ def parse_args(argument_string):
     parser.add_argument('-p',
                         help='Put program in performance measurement mode',
                         action="store_true")
+    parser.add_argument('-w',
+                        help='Number of worker processes to parse the pages with. Default=1',
+                        default=1,
+                        type=int,
+                        dest='workers')
+    parser.add_argument('--order',
+                        help='Order of the csv rows: as the pages are in the file, or by LSN from the oldest page up to '
+                             'the current LSN of the restart area. Default=%(default)s',
+                        choices=['file', 'lsn'],
+                        default='file',
+                        dest='order')
+    parser.add_argument('--recover-stale',
+                        help='With --order lsn, also give the records of stale pages and those outside the live LSN range',
+                        action='store_true',
+                        dest='recover_stale')
     return parser.parse_args()
 
 
 if __name__ == '__main__':
     args = parse_args(sys.argv[1:])
 
-    data = LogFile(dump_dir=args.dump_dir, file_name=args.file_name, performance=args.p)
-    data.parse_all(args.num)
+    if args.image:
+        sector = BootSector(image_name=args.image,
+                            offset_sectors=args.offset_sectors,
+                            offset_bytes=args.offset_bytes,
+                            sector_size=args.sector_size)
+        data = LogFile.from_image(image_name=args.image, boot_sector=sector, dump_dir=args.dump_dir,
+                                  performance=args.p)
+    else:
+        data = LogFile(dump_dir=args.dump_dir, file_name=args.file_name, performance=args.p)
+    data.parse_all(args.num, workers=args.workers)
 
     if args.export_type == 'parsed':
         data.export_parsed(export_file=args.export_file)
     elif args.export_type == 'csv':
         data.connect_transactions()
-        data.export_csv(export_file=args.export_file)
+        data.export_csv(export_file=args.export_file, order=args.order, recover_stale=args.recover_stale)
     elif args.export_type == 'transaction':
         data.connect_transactions()
         #data.print_transactions(export_file=args.export_file)
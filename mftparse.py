@@ -7,6 +7,7 @@ import sys
 from ntfs_parse import MFT
 from ntfs_parse import BootSector
 from ntfs_parse import InumRange
+from ntfs_parse import ParseCache
 
 def parse_args(argument_string):
     common_arguments = ArgumentParser(add_help=False)
@@ -35,6 +36,10 @@ def parse_args(argument_string):
                                   help='extracted $MFT file',
                                   dest='file')
 
+    common_arguments.add_argument('--cache',
+                        help='directory to keep parse results in, to be reused by later runs on the same image',
+                        dest='cache')
+
     # Group of subcommands
     parser = ArgumentParser(description='MFT parser')
     sub_parsers = parser.add_subparsers(help='actions', dest='action')
@@ -60,6 +65,19 @@ def parse_args(argument_string):
                                dest='inums',
                                default='all')
 
+    export_parser.add_argument('--full-path',
+                               help='Add a column with the full path of every entry to the csv, empty for entries '
+                                    'that are not in use. Reads the whole MFT first, also for a range of inums',
+                               action='store_true',
+                               dest='full_path')
+
+    export_parser.add_argument('-w',
+                               help='Number of worker processes that parse and format the MFT, not used for raw exports '
+                                    'and ranges of inums. Default=%(default)s',
+                               dest='workers',
+                               default=1,
+                               type=int)
+
     ### extractdata
     help = 'Extracts data for a single entry, essentially returning the file'
     extractdata_parser = sub_parsers.add_parser('extractdata', parents=[common_arguments],
@@ -85,6 +103,11 @@ def parse_args(argument_string):
     statistics_parser = sub_parsers.add_parser('statistics', parents=[common_arguments],
                                                description=help,
                                                help=help)
+    statistics_parser.add_argument('-w',
+                                   help='Number of worker processes that parse the MFT. Default=%(default)s',
+                                   dest='workers',
+                                   default=1,
+                                   type=int)
 
     return parser.parse_args(argument_string)
 
@@ -98,32 +121,49 @@ if __name__ == '__main__':
                   sector_size=args.sector_size)
 
 
-    mft = MFT(image_name=args.image, boot_sector=sector)
+    cache = None
+    if args.cache:
+        cache = ParseCache(directory=args.cache, image_name=args.image, boot_sector=sector)
+
+    mft = MFT(image_name=args.image, boot_sector=sector, cache=cache)
 
     # Export
     if args.action == 'export':
-        # Parsing
         if args.inums == 'all':
-            mft.parse_all()
             range = None
         else:
             range = InumRange(args.inums)
-            mft.parse_inums(inum_range=range)
 
-        # Exporting
+        # Exporting, the entries are parsed while they are written out
         if args.export_type == 'parsed':
-            mft.export_parsed(inum_range=range, export_file=args.export_file)
+            mft.export_parsed(inum_range=range, export_file=args.export_file, workers=args.workers)
         elif args.export_type == 'csv':
-            mft.export_csv(inum_range=range, export_file=args.export_file)
+            mft.export_csv(inum_range=range, export_file=args.export_file, full_path=args.full_path,
+                           workers=args.workers)
         elif args.export_type == 'raw':
             mft.export_raw(inum_range=range, export_file=args.export_file)
 
     # Extract data
     if args.action == 'extractdata':
-        mft.parse_inum(args.inum)
+        # With a cache, system files are extracted straight from their cached runlist
+        if args.data_stream or not cache or args.inum not in mft.system_runlists():
+            mft.parse_inum(args.inum)
         mft.extract_data(inum=args.inum, output_file=args.output_file, stream=args.data_stream)
 
     # Statistics
     if args.action == 'statistics':
-        mft.parse_all()
-        mft.print_statistics()
\ No newline at end of file
+        columns = None
+        if cache:
+            # The columns are read from the cache after the first run. They need NumPy, without it every entry is
+            # parsed, as without a cache.
+            try:
+                columns = mft.to_columns()
+            except ImportError:
+                print('NumPy not found, the statistics are not cached', file=sys.stderr)
+        if columns is not None:
+            mft.print_statistics(columns=columns)
+        else:
+            mft.parse_all(lazy=True, workers=args.workers)
+            mft.print_statistics()
+
+    mft.close()
@@ -1,7 +1,10 @@
-from .utils import reverse, reverse_hexlify, reverse_hexlify_int, filetime_to_datetime, writeout_as_xxd
+from .utils import reverse, reverse_hexlify, reverse_hexlify_int, filetime_to_datetime, filetime_int_to_datetime, \
+    datetime_to_filetime, writeout_as_xxd, StructLayout, copy_range, skip_range, fixup_mismatches, \
+    replace_fixups
 from .common import FileAttributesFlag
 
-from .mft import MFT, InumRange, mft_entry, FileName, AttributeHeaderResident, AttributeHeaderNonResident, AttributeTypeEnum
+from .mft import MFT, DataStream, InumRange, mft_entry, FileName, AttributeHeaderResident, AttributeHeaderNonResident, AttributeTypeEnum
 from .boot_sector import BootSector
+from .cache import ParseCache
 from .logfile import LogFile
-from .usn_jrnl import UsnJrnl, usn_jrnl, UsnRecord
+from .usn_jrnl import UsnJrnl, usn_jrnl, UsnRecord, UsnMax, UsnCheckpoint
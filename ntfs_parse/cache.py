@@ -0,0 +1,76 @@
+########################################################################################################################
+# ParseCache class
+#
+# Keeps results of earlier runs against the same image in a directory, so they don't have to be parsed again. Every
+# image gets its own subdirectory, named after a key made of the path, size and modification time of the image, the
+# partition offset and a hash of the boot sector. When any of them changes the key changes with it, and the old results
+# are simply not found anymore.
+#
+# Values are stored with pickle, one file each, so only point it at directories you trust. Outputs, like a complete csv
+# export, are stored as they are.
+########################################################################################################################
+
+from hashlib import sha1
+import os
+import pickle
+import shutil
+
+
+class ParseCache():
+    # Bump when the format of what's stored changes, older caches are then ignored
+    VERSION = 5
+
+    def __init__(self, directory=None, image_name=None, boot_sector=None):
+        self.directory = directory
+        self.key = ParseCache.image_key(image_name, boot_sector)
+        self.path = os.path.join(directory, self.key)
+
+    @staticmethod
+    def image_key(image_name, boot_sector):
+        """Hex digest that identifies an image, the partition in it and the state it was in"""
+        stat = os.stat(image_name)
+        identity = '%d|%s|%d|%d|%d|%s' % (ParseCache.VERSION,
+                                           os.path.abspath(image_name),
+                                           stat.st_size,
+                                           stat.st_mtime_ns,
+                                           boot_sector.byte_offset,
+                                           sha1(boot_sector.data).hexdigest())
+        return sha1(identity.encode()).hexdigest()
+
+    def _file_name(self, name, extension='.pickle'):
+        return os.path.join(self.path, name + extension)
+
+    def __contains__(self, name):
+        return os.path.exists(self._file_name(name))
+
+    def load(self, name, default=None):
+        """Returns the value stored under name, or default when there is none (or it can't be read)"""
+        try:
+            with open(self._file_name(name), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def store(self, name, value):
+        self._store_file(self._file_name(name), lambda f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
+
+    def _store_file(self, file_name, write, mode='wb'):
+        os.makedirs(self.path, exist_ok=True)
+        # Write to a temporary file first, so an interrupted run never leaves half a value behind
+        temp_name = '%s.%d.tmp' % (file_name, os.getpid())
+        with open(temp_name, mode) as f:
+            write(f)
+        os.replace(temp_name, file_name)
+
+    def has_output(self, name):
+        return os.path.exists(self._file_name(name, ''))
+
+    def copy_output(self, name, out):
+        """Copies the output stored under name to the binary file out"""
+        with open(self._file_name(name, ''), 'rb') as f:
+            shutil.copyfileobj(f, out)
+
+    def store_output(self, name, write):
+        """Stores what write(f) writes to the text file f under name"""
+        self._store_file(self._file_name(name, ''), write, mode='w')
@@ -5,19 +5,53 @@
 #
 ########################################################################################################################
 
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import csv
+import heapq
 import sys
 import os
 
 from .rstr_record import RSTRRecord
-from .rcrd_record import RCRDRecord
+from .rcrd_record import RCRDRecord, LoggingPageHeader, LSNRecordHeader, LSNRecordData
 from .transaction import Transaction
 
 
+def _parse_rcrd_chunk(file_name, stream, dump_dir, cluster_size, first_nr, count):
+    """Worker for the parallel parse. Parses count RCRD pages from page first_nr on, the first one as if there is no
+    leftover from the page before it. Returns (page, leftover key) per page, the error pages aren't dumped yet."""
+    logfile = LogFile(dump_dir=dump_dir, file_name=file_name, cluster_size=cluster_size, stream=stream)
+    pages = []
+    leftover = None
+    with logfile._open() as f:
+        f.seek((first_nr + 1) * cluster_size)
+        for nr in range(first_nr, first_nr + count):
+            page = RCRDRecord(f.read(cluster_size), nr, logfile.dump_dir, leftover, defer_dumps=True)
+            pages.append((page, _leftover_key(page)))
+            leftover = page.leftover
+    return pages
+
+
+def _leftover_key(page):
+    """What the next page gets from page, taken before the next page adds its part to the leftover"""
+    leftover = page.leftover
+    if leftover is None:
+        return None
+    return leftover.lsn_hdr.data, leftover.lsn_data.data, leftover.data
+
+
 class LogFile:
-    def __init__(self, dump_dir=None, file_name=None, cluster_size=4096, performance=False):
+    # Number of RCRD pages a worker parses in one go
+    CHUNK_PAGES = 256
+    # Number of the first RCRD page, after the two restart pages and the two buffer pages
+    FIRST_PAGE_NR = 3
+
+    def __init__(self, dump_dir=None, file_name=None, cluster_size=4096, performance=False, stream=None):
         self.dump_dir = os.getcwd()
         self.file_name = file_name
+        # A file object to read from instead of file_name, like a DataStream on the image
+        self.stream = stream
         self.cluster_size = cluster_size
         self.performance = performance
         self.rstr_records = []
@@ -28,9 +62,16 @@ class LogFile:
         self.lsns = {}
         self.transactions = {}
         self.faulty_transactions = []
+        # (lsn, previous lsn) of transactions of which the previous lsn isn't in the log
+        self.unmatched_previous_lsns = []
+        # Last lsn of transactions that don't end in a forget transaction or compensation log record
+        self.unfinished_lsns = []
         self.error_start_from_offset = 0
         self.error_discard_data = 0
         self.invalid_page_count = 0
+        # Pages of which not every sector ended in the fixup value, and how often each sector number didn't
+        self.fixup_error_page_count = 0
+        self.fixup_error_sectors = Counter()
         self.page_count = 0
         self.total_entries = 0
 
@@ -40,38 +81,208 @@ class LogFile:
                 os.makedirs(dump_path)
             self.dump_dir = dump_path
 
+    @classmethod
+    def from_image(cls, image_name=None, boot_sector=None, mft=None, **kwargs):
+        """Creates a LogFile that reads $LogFile (inum 2) straight from the image. Takes either an MFT object or the
+        BootSector to create one with. Other arguments are passed on to LogFile."""
+        from ntfs_parse.mft import MFT
+        if mft is None:
+            mft = MFT(image_name=image_name, boot_sector=boot_sector)
+        return cls(stream=mft.open_stream(inum=MFT.LOGFILE, stream=0), **kwargs)
+
     ####################################################################################################################
     # class functions
-    def parse_all(self, num=None):
-            if num: num += 3
+    @contextmanager
+    def _open(self):
+        if self.stream is None:
             with open(self.file_name, 'rb') as f:
-                # first and second RSTR record
-                for x in range(1, 3):
-                    rstr_record = RSTRRecord(f.read(self.cluster_size))
-                    self.rstr_records.append(rstr_record)
-                # first and second Buffer Pages
-                for x in range(1, 3):
-                    buff_record = RCRDRecord(f.read(self.cluster_size), x, self.dump_dir)
-                    self.buff_records.append(buff_record)
-                i = 3
-                prev_page = RCRDRecord(f.read(self.cluster_size), i, self.dump_dir)
-                self.add_if_valid(prev_page)
-                self.keep_count(prev_page)
-                while True:
-                    buffer = f.read(self.cluster_size)
-                    if len(buffer) != self.cluster_size:
-                        break
-                    else:
-                        i += 1
-                        curr_page = RCRDRecord(buffer, i, self.dump_dir, prev_page.leftover)
-                        self.add_if_valid(curr_page)
-                        prev_page = curr_page
-                        if i == num:
-                            break
+                yield f
+        else:
+            # The stream belongs to the caller, leave it open
+            self.stream.seek(0)
+            yield self.stream
+
+    def parse_areas(self):
+        """Parses the restart area and the logging area, the pages before the first RCRD page"""
+        with self._open() as f:
+            # first and second RSTR record
+            for x in range(1, 3):
+                rstr_record = RSTRRecord(f.read(self.cluster_size))
+                self.rstr_records.append(rstr_record)
+            # first and second Buffer Pages
+            for x in range(1, 3):
+                buff_record = RCRDRecord(f.read(self.cluster_size), x, self.dump_dir)
+                self.buff_records.append(buff_record)
+
+    def parse_all(self, num=None, workers=None):
+            self.parse_areas()
+            if workers and workers > 1:
+                if num: num += 3
+                with self._open() as f:
+                    f.seek((self.FIRST_PAGE_NR + 1) * self.cluster_size)
+                    prev_page = RCRDRecord(f.read(self.cluster_size), self.FIRST_PAGE_NR, self.dump_dir)
+                    self.add_if_valid(prev_page)
+                    self.keep_count(prev_page)
+                    self._parse_parallel(f, prev_page, num, workers)
+            else:
+                for _ in self.iter_pages(num):
+                    pass
             if self.performance:
                 self.print_performance()
 
+    def iter_pages(self, num=None, keep=True):
+        """Generator that parses the RCRD pages one at a time, in the order of the file, and yields the valid ones. The
+        restart and logging area are not parsed, see parse_areas. With keep the pages are added to rcrd_records and
+        their LSN's are indexed for connect_transactions, otherwise they are only counted."""
+        if num: num += 3
+        with self._open() as f:
+            i = self.FIRST_PAGE_NR
+            f.seek((i + 1) * self.cluster_size)
+            prev_page = RCRDRecord(f.read(self.cluster_size), i, self.dump_dir)
+            if self.add_if_valid(prev_page, keep):
+                yield prev_page
+            self.keep_count(prev_page)
+            while True:
+                buffer = f.read(self.cluster_size)
+                if len(buffer) != self.cluster_size:
+                    break
+                else:
+                    i += 1
+                    curr_page = RCRDRecord(buffer, i, self.dump_dir, prev_page.leftover)
+                    if self.add_if_valid(curr_page, keep):
+                        yield curr_page
+                    prev_page = curr_page
+                    if i == num:
+                        break
+
+    def _parse_parallel(self, f, prev_page, last_nr, workers):
+        """Parses the RCRD pages after prev_page in chunks, up to and including page last_nr when given. A chunk doesn't
+        know the leftover of the chunk before it, so its pages are parsed again from where that leftover makes a
+        difference, until a page leaves the same leftover as it did without it."""
+        size = f.seek(0, os.SEEK_END)
+        # Page i starts at page i + 1 of the file, a partial page at the end isn't parsed
+        end_nr = size // self.cluster_size - 1
+        if last_nr:
+            end_nr = min(end_nr, last_nr + 1)
+        first_nrs = list(range(int(prev_page.nr) + 1, end_nr, self.CHUNK_PAGES))
+        counts = [min(self.CHUNK_PAGES, end_nr - nr) for nr in first_nrs]
+        prev_key = _leftover_key(prev_page)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_parse_rcrd_chunk,
+                                   [self.file_name] * len(first_nrs),
+                                   [self.stream] * len(first_nrs),
+                                   [self.dump_dir] * len(first_nrs),
+                                   [self.cluster_size] * len(first_nrs),
+                                   first_nrs,
+                                   counts)
+            for chunk in results:
+                # The leftover the worker parsed the next page with, and the page it came from
+                chunk_key = None
+                chunk_prev = None
+                for page, key in chunk:
+                    if prev_key == chunk_key:
+                        if chunk_prev is not None and chunk_prev is not prev_page:
+                            # The page before was parsed again, take over the leftover this page added its part to
+                            prev_page.leftover = chunk_prev.leftover
+                        page.write_pending_dumps()
+                        curr_page, curr_key = page, key
+                    else:
+                        f.seek((int(page.nr) + 1) * self.cluster_size)
+                        curr_page = RCRDRecord(f.read(self.cluster_size), int(page.nr), self.dump_dir,
+                                               prev_page.leftover)
+                        curr_key = _leftover_key(curr_page)
+                    self.add_if_valid(curr_page)
+                    chunk_key, chunk_prev = key, page
+                    prev_page, prev_key = curr_page, curr_key
+
+    def iter_records(self, order='lsn', recover_stale=False):
+        """Yields the (lsn header, lsn data) tuples of the records.
+
+        order='file' gives those of the parsed pages, in the order of the pages in the file. order='lsn' reads the log
+        itself, as the circular log it is, and needs no parse_all. The live pages are those with a last lsn in their
+        header from the oldest lsn of the log client up to the page with the current lsn of the restart area. They are
+        read from the oldest one on, wrapping around at the end of the file, and the records from the oldest lsn up to
+        the current lsn are given. The other pages are stale, left over from an earlier round through the log. With
+        recover_stale those are merged in by LSN, together with the records outside the live range. Pages are parsed
+        one at a time, error pages aren't dumped."""
+        for _, entry in self._iter_page_records(order, recover_stale):
+            yield entry
+
+    def _iter_page_records(self, order='lsn', recover_stale=False):
+        """(page, (lsn header, lsn data)) per record, see iter_records"""
+        if order == 'file':
+            for rcrd in self.rcrd_records:
+                for entry in rcrd.lsn_entries:
+                    yield rcrd, entry
+            return
+        if order != 'lsn':
+            raise ValueError('order is \'file\' or \'lsn\', not %r' % order)
+
+        with self._open() as f:
+            # The restart page written last has the current lsn
+            restart = max((RSTRRecord(f.read(self.cluster_size)) for _ in range(2)),
+                          key=lambda rstr: rstr.restart_area.current_lsn)
+            current_lsn = restart.restart_area.current_lsn
+            oldest_lsn = restart.log_client.oldest_lsn
+
+            # Only the page headers are read to find the live pages
+            end_nr = f.seek(0, os.SEEK_END) // self.cluster_size - 1
+            page_lsns = {}
+            for nr in range(self.FIRST_PAGE_NR, end_nr):
+                f.seek((nr + 1) * self.cluster_size)
+                header = LoggingPageHeader(f.read(RCRDRecord.PAGE_HEADER_LENGTH))
+                if not header.malformed_page():
+                    page_lsns[nr] = header.last_lsn_or_offset_to_next_page
+            if not page_lsns:
+                return
+            # The page the current lsn is on is the first one to end at or after it
+            current_page_lsn = min((lsn for lsn in page_lsns.values() if lsn >= current_lsn), default=current_lsn)
+            live = [nr for nr, lsn in page_lsns.items() if oldest_lsn <= lsn <= current_page_lsn]
+            stale = [nr for nr, lsn in page_lsns.items() if not oldest_lsn <= lsn <= current_page_lsn]
+            if live:
+                oldest = live.index(min(live, key=page_lsns.get))
+                live = live[oldest:] + live[:oldest]
+
+            live_records = self._read_pages(f, live, end_nr)
+            if not recover_stale:
+                for rcrd, entry in live_records:
+                    if entry[0].this_lsn > current_lsn:
+                        return
+                    if entry[0].this_lsn >= oldest_lsn:
+                        yield rcrd, entry
+                return
+
+            # Stale pages that follow each other are read together, they may share a split record
+            runs = []
+            for nr in stale:
+                if runs and runs[-1][-1] + 1 == nr:
+                    runs[-1].append(nr)
+                else:
+                    runs.append([nr])
+            yield from heapq.merge(live_records, *[self._read_pages(f, run, end_nr) for run in runs],
+                                   key=lambda page_entry: page_entry[1][0].this_lsn)
+
+    def _read_pages(self, f, nrs, end_nr):
+        """Parses the pages nrs in the given order and yields (page, (lsn header, lsn data)) per record. A page gets
+        the leftover of the page before it when that is the page before it in the log, which continues at the first
+        page after the last page of the file."""
+        prev_page = None
+        for nr in nrs:
+            leftover = None
+            if prev_page is not None and (int(prev_page.nr) + 1 if int(prev_page.nr) + 1 < end_nr
+                                          else self.FIRST_PAGE_NR) == nr:
+                leftover = prev_page.leftover
+            # Another reader may have moved the file position
+            f.seek((nr + 1) * self.cluster_size)
+            page = RCRDRecord(f.read(self.cluster_size), nr, self.dump_dir, leftover, defer_dumps=True)
+            prev_page = page
+            for entry in page.lsn_entries:
+                yield page, entry
+
     def connect_transactions(self):
+        """Connects the LSN's into transactions through their previous lsn, going left and right from an arbitrary LSN
+        that isn't in a transaction yet. Every LSN is taken out of the indexes once, so this is linear in the number of
+        LSN's. What couldn't be connected is kept in unmatched_previous_lsns and unfinished_lsns."""
         transaction_num = 0
         while len(self.this_lsn_index) > 0:
             # Pick an arbitrary lsn from the index
@@ -81,29 +292,23 @@ class LogFile:
             # Start expanding the transaction to the left as long as the transaction thinks it's not done
             left_lsn_tuple = kickoff_lsn_tuple
             while transaction.continue_left:
-                try:
-                    key = left_lsn_tuple[0].previous_lsn
-                    left_lsn_tuple = self.this_lsn_index.pop(key)
-                    transaction.prepend(left_lsn_tuple)
-                except KeyError:
-                    # print('error left ', kickoff_lsn_tuple[0].this_lsn, key)
+                key = left_lsn_tuple[0].previous_lsn
+                if key not in self.this_lsn_index:
+                    self.unmatched_previous_lsns.append((left_lsn_tuple[0].this_lsn, key))
                     break
+                left_lsn_tuple = self.this_lsn_index.pop(key)
+                transaction.prepend(left_lsn_tuple)
 
             # Start expanding the transcation to the right as long as the transaction thinks it's not done
             right_lsn_tuple = kickoff_lsn_tuple
             while transaction.continue_right:
-                try:
-                    key = right_lsn_tuple[0].this_lsn
-                    right_lsn_tuple = self.prev_lsn_index.pop(key)
-                    transaction.append(right_lsn_tuple)
-                    try:
-                        self.this_lsn_index.pop(right_lsn_tuple[0].this_lsn)
-                    except Exception as e:
-                        # print('error right right', kickoff_lsn_tuple[0].this_lsn, e)
-                        pass
-                except KeyError:
-                    # print('error right', kickoff_lsn_tuple[0].this_lsn, key)
+                key = right_lsn_tuple[0].this_lsn
+                if key not in self.prev_lsn_index:
+                    self.unfinished_lsns.append(key)
                     break
+                right_lsn_tuple = self.prev_lsn_index.pop(key)
+                transaction.append(right_lsn_tuple)
+                self.this_lsn_index.pop(right_lsn_tuple[0].this_lsn, None)
 
             if transaction.is_correct:
                 key = transaction.mft_key
@@ -113,6 +318,8 @@ class LogFile:
             transaction.transaction_num = transaction_num
             transaction.attach_transaction_number_to_lsns()
             transaction_num += 1
+        if self.performance:
+            self.print_transaction_counts()
 
     def print_transactions(self):
         for key, transaction in self.transactions.items():
@@ -131,43 +338,52 @@ class LogFile:
         else:
             self.writeout_parsed(sys.stdout)
 
-    def export_csv(self, export_file = None):
+    @staticmethod
+    def format_csv_column_headers():
+        header = RCRDRecord.formatted_csv_column_headers()
+        header.extend(LSNRecordHeader.formatted_csv_column_headers())
+        header.extend(LSNRecordData.formatted_csv_column_headers())
+        return header
+
+    def export_csv(self, export_file=None, order='file', recover_stale=False):
+        """Writes a row per LSN. With order='lsn' the rows are in LSN order, see iter_records, and pages without
+        LSN's don't get a row."""
         if not self.rcrd_records:
             return
-        first_rcrd = self.rcrd_records[0]
-        header = first_rcrd.formatted_csv_column_headers
-        header.extend(first_rcrd.lsn_header_csv_columns)
-        header.extend(first_rcrd.lsn_data_csv_columns)
+        header = self.format_csv_column_headers()
         if export_file:
             with open(export_file, 'w') as f:
                 csv_writer = csv.writer(f)
                 csv_writer.writerow(header)
-                for rcrd in self.rcrd_records:
-                    rcrd.export_csv(csv_writer)
+                self.writeout_csv(csv_writer, order, recover_stale)
         else:
             csv_writer = csv.writer(sys.stdout)
             csv_writer.writerow(header)
+            self.writeout_csv(csv_writer, order, recover_stale)
+
+    def writeout_csv(self, csv_writer, order='file', recover_stale=False):
+        if order == 'file':
             for rcrd in self.rcrd_records:
-                    rcrd.export_csv(csv_writer)
+                rcrd.export_csv(csv_writer)
+        else:
+            for rcrd, (lsn_hdr, lsn_data) in self._iter_page_records(order, recover_stale):
+                csv_writer.writerow(rcrd.formatted_csv_entry(lsn_hdr, lsn_data))
 
     def export_transactions(self, export_file=None):
         if not self.rcrd_records:
             return
         if export_file:
             with open(export_file, 'w') as f:
-                csv_writer = csv.writer(f)
-                csv_writer.writerow(Transaction.format_csv_column_headers())
-                for transaction in self.transactions.values():
-                    csv_writer.writerow(transaction.format_csv())
-                for transaction in self.faulty_transactions:
-                    csv_writer.writerow(transaction.format_csv())
+                self.writeout_transactions(csv.writer(f))
         else:
-            csv_writer = csv.writer(sys.stdout)
-            csv_writer.writerow(Transaction.format_csv_column_headers())
-            for transaction in self.transactions.values():
-                csv_writer.writerow(transaction.format_csv())
-            for transaction in self.faulty_transactions:
-                csv_writer.writerow(transaction.format_csv())
+            self.writeout_transactions(csv.writer(sys.stdout))
+
+    def writeout_transactions(self, csv_writer):
+        csv_writer.writerow(Transaction.format_csv_column_headers())
+        for transaction in self.transactions.values():
+            csv_writer.writerow(transaction.format_csv())
+        for transaction in self.faulty_transactions:
+            csv_writer.writerow(transaction.format_csv())
 
     def export_parsed_lsns(self, export_file=None, lsn_numbers=None):
         if export_file:
@@ -200,13 +416,17 @@ class LogFile:
         lsn_data.writeout_operation_data(out)
         lsn_data.writeout_itrprt_op_data(out)
 
-    # add if page has valid page header
-    def add_if_valid(self, page):
+    # add if page has valid page header, only count it without keep. Returns whether it's valid.
+    def add_if_valid(self, page, keep=True):
         if page.header.magic_number != 'RCRD':
             self.invalid_page_count += 1
+            return False
         else:
             self.count_errors_in_page(page.error)
+            self.count_fixup_errors(page.fixup_mismatches)
             self.keep_count(page)
+            if not keep:
+                return True
             self.rcrd_records.append(page)
 
             for lsn_header, lsn_content in page.lsn_entries:
@@ -218,6 +438,7 @@ class LogFile:
             #if page.connector_prev_lsn:
             #    self.prev_lsn_index[page.connector_prev_lsn] = page
             #self.last_lsn_index[page.connector_last_lsn] = page
+            return True
 
     # keep count of the number of pages and total entries
     def keep_count(self, page):
@@ -231,9 +452,21 @@ class LogFile:
         elif error > 1:
             self.error_discard_data += 1
 
+    def count_fixup_errors(self, fixup_mismatches):
+        if fixup_mismatches:
+            self.fixup_error_page_count += 1
+            self.fixup_error_sectors.update(fixup_mismatches)
+
     ####################################################################################################################
     # PRINT functions
     def writeout_parsed(self, out):
+        self.writeout_parsed_areas(out)
+        for rcrd in self.rcrd_records:
+            # rcrd.writeout_parsed(out)
+            rcrd.writeout_all(out)
+
+    def writeout_parsed_areas(self, out):
+        """Writes out the restart and logging area, up to where the actual records start"""
         out.write('\n'
                   'Restart Area ####################################################################################\n')
         for rstr in self.rstr_records:
@@ -244,13 +477,18 @@ class LogFile:
             buff.writeout_parsed(out)
         out.write('\n'
                   'Actual records ##################################################################################\n')
-        for rcrd in self.rcrd_records:
-            # rcrd.writeout_parsed(out)
-            rcrd.writeout_all(out)
+
+    def print_transaction_counts(self):
+        print("Correct transactions         : %7i" % len(self.transactions))
+        print("Faulty transactions          : %7i" % len(self.faulty_transactions))
+        print("  previous LSN not found     : %7i" % len(self.unmatched_previous_lsns))
+        print("  no forget+compensation     : %7i" % len(self.unfinished_lsns))
 
     def print_performance(self):
         print("Total invalid pages          : %7i" % self.invalid_page_count)
         print("Total valid pages            : %7i" % self.page_count)
         print("  errors -> start from offset: %7i" % self.error_start_from_offset)
         print("  errors -> discard all data : %7i" % self.error_discard_data)
+        print("  errors -> fixup mismatch   : %7i" % self.fixup_error_page_count)
+        print("     sectors not fixed up    : %7i" % sum(self.fixup_error_sectors.values()))
         print("Total entries                : %7i" % self.total_entries)
@@ -1,53 +1,6 @@
 from binascii import hexlify
 
 
-# Search for the fixup_value in the data, if found on the end of the sector then add the corresponding
-#  value from the fixup_array in a dictionary with the offset.
-# Function also counts the amount of times it found a match with the fixup_value
-#  expected (default = 8)  because 8*512 = 4096
-#
-# input:
-#   - data (4096 bytes)
-# output:
-#   - Boolean (True or False)
-#   - True -> offset_dict with offsets and fixup_array values
-def search_fixup(self, data):
-    offset_dict = {}
-    offset = self.SECTOR_SIZE - 2
-    fixup_value = self.header.fixup_value
-    count = 0
-    # start at 510, read 2 bytes, repeat every 512.
-    for x in range(offset, len(data), self.SECTOR_SIZE):
-        if hexlify(data[x:x+2]) == fixup_value:
-            count += 1
-            start = int(x/offset-1) << 1
-            stop = int(x/offset) << 1
-            offset_dict[x] = self.header.fixup_array_raw[start:stop]
-        else:
-            print('Data: %s at offset %i is not fixup_value: %s' % (hexlify(data[x:x+2]), x, hexlify(fixup_value)))
-    return offset_dict if count == self.SECTOR_AMOUNT else {}
-
-
-# Replace the fixup values with the actual values from a offset dictionary
-# Uses bytarray as it is mutable and memoryview to adjust the data.
-#
-# input:
-#   - data (4096 bytes) ~~non writable~~
-# output:
-#   - data (4096 bytes) ~~non writable~~
-def replace_fixup(self, data):
-    # make it writeable through memoryview
-    wdata = bytearray(data)
-    v = memoryview(wdata)
-    for offset in self.offset_dict.keys():
-        # print('offset: %i -> old data: %s' % (offset, hexlify(wdata[offset:offset+2])))
-        v[offset:offset+2] = self.offset_dict[offset]
-        # print('offset: %i -> new data: %s' % (offset, hexlify(wdata[offset:offset+2])))
-    # make it immutable again
-    idata = bytes(wdata)
-    return idata
-
-
 def interpret(data):
     interpreted_data = ''
     for byte in range(len(data)):
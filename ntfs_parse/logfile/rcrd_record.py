@@ -13,10 +13,10 @@
 
 import os, sys
 from binascii import hexlify
-from ntfs_parse import reverse_hexlify_int
+from ntfs_parse import StructLayout, fixup_mismatches, replace_fixups
 from ntfs_parse.usn_jrnl import UsnRecord
 from ntfs_parse.mft import MFTEntry, AttributeFactory, AttributeTypeEnum
-from .logfile_utils import search_fixup, replace_fixup, writeout_as_xxd, get_operation_type
+from .logfile_utils import writeout_as_xxd, get_operation_type
 
 
 class RCRDRecord:
@@ -25,10 +25,12 @@ class RCRDRecord:
     SECTOR_SIZE = 512
     SECTOR_AMOUNT = 8
 
-    def __init__(self, data, page_nr, dump_dir, remaining=None, offset=0, cluster_size=4096):
+    def __init__(self, data, page_nr, dump_dir, remaining=None, offset=0, cluster_size=4096, defer_dumps=False):
         self.data = data
         self.nr = str(page_nr)
         self.dump_dir = dump_dir
+        # With defer_dumps the pages to dump are kept until write_pending_dumps, for parsing in another process
+        self.pending_dumps = [] if defer_dumps else None
         self.offset = offset
         self.cluster_size = cluster_size
         self.leftover = None
@@ -36,16 +38,20 @@ class RCRDRecord:
         self.lsn_stop = 0
         self.error = 0
         self.lsn_entries = []
+        self.fixup_mismatches = []
 
         self.header = LoggingPageHeader(data[:self.PAGE_HEADER_LENGTH])
         if self.header.malformed_page():
             self.dump_page_to_file(header=True)
             return
 
-        # searching for the fixup_value on the sector endings and replacing them with original code.
-        self.offset_dict = search_fixup(self, data)
-        if self.offset_dict:
-            self.data = replace_fixup(self, data)
+        # checking the sector endings for the fixup_value, only when all of them have it the original bytes are put back.
+        self.fixup_mismatches = fixup_mismatches(data, LoggingPageHeader.FIXUP_VALUE[1], self.SECTOR_AMOUNT + 1,
+                                                 self.SECTOR_SIZE)
+        if not self.fixup_mismatches:
+            fixed_data = bytearray(data)
+            replace_fixups(fixed_data, LoggingPageHeader.FIXUP_VALUE[1], self.SECTOR_AMOUNT + 1, self.SECTOR_SIZE)
+            self.data = bytes(fixed_data)
 
         # part that checks if there is a remaining LSN to parse from previous page
         if self.prev_leftover:
@@ -106,9 +112,18 @@ class RCRDRecord:
         # dump_path = os.path.join(os.getcwd(), self.dump_dir) if self.dump_dir else os.getcwd()
         # print(dump_path)
         filename = os.path.join(self.dump_dir, pre+self.nr+offset)
+        if self.pending_dumps is not None:
+            self.pending_dumps.append((filename, self.data))
+            return
         with open(filename, 'wb') as f:
             f.write(self.data)
 
+    def write_pending_dumps(self):
+        for filename, data in self.pending_dumps or []:
+            with open(filename, 'wb') as f:
+                f.write(data)
+        self.pending_dumps = None
+
     ####################################################################################################################
     # PRINT functions
     def writeout_parsed(self, out):
@@ -156,10 +171,13 @@ class RCRDRecord:
             csv_writer.writerow(self.formatted_csv())
             return
         for (lsn_hdr, lsn_data) in self.lsn_entries:
-            record = self.formatted_csv()
-            record.extend(lsn_hdr.formatted_csv())
-            record.extend(lsn_data.formatted_csv())
-            csv_writer.writerow(record)
+            csv_writer.writerow(self.formatted_csv_entry(lsn_hdr, lsn_data))
+
+    def formatted_csv_entry(self, lsn_hdr, lsn_data):
+        record = self.formatted_csv()
+        record.extend(lsn_hdr.formatted_csv())
+        record.extend(lsn_data.formatted_csv())
+        return record
 
     # Some ordering variables, used in the future, not finished
     @property
@@ -177,8 +195,8 @@ class RCRDRecord:
     def entry_count(self):
         return len(self.lsn_entries)
 
-    @property
-    def formatted_csv_column_headers(self):
+    @classmethod
+    def formatted_csv_column_headers(cls):
         return ['conn prev LSN',  # Page info
                 'conn last LSN',
                 ]
@@ -213,10 +231,13 @@ class LoggingPageHeader:
     FIXUP_VALUE                     = ('fixup value', 40, 41)
     FIXUP_ARRAY                     = ('fixup array', 42, 57)
     RESERVED2                       = ('reserved2', 58, 63)
+    LAYOUT = StructLayout(UPDATE_SEQ_ARRAY_OFFSET, UPDATE_SEQ_ARRAY_COUNT, LAST_LSN_or_OFFSET_TO_NEXT_PAGE, FLAGS,
+                          PAGE_COUNT, PAGE_POSITION, NEXT_RECORD_OFFSET, LAST_END_LSN)
 
     def __init__(self, data):
         self.data = data
         self.length = 64
+        self._values = self.LAYOUT.unpack(data)
 
     def malformed_page(self):
         return True if self.magic_number_raw != b'\x52\x43\x52\x44' or \
@@ -272,28 +293,28 @@ class LoggingPageHeader:
         return magic_nr.decode() if magic_nr == b'\x52\x43\x52\x44' else hexlify(magic_nr)
 
     @property
-    def update_seq_array_offset(self): return reverse_hexlify_int(self.update_seq_array_offset_raw)
+    def update_seq_array_offset(self): return self._values[self.UPDATE_SEQ_ARRAY_OFFSET]
 
     @property
-    def update_seq_array_count(self): return reverse_hexlify_int(self.update_seq_array_count_raw)
+    def update_seq_array_count(self): return self._values[self.UPDATE_SEQ_ARRAY_COUNT]
 
     @property
-    def last_lsn_or_offset_to_next_page(self): return reverse_hexlify_int(self.last_lsn_or_offset_to_next_page_raw)
+    def last_lsn_or_offset_to_next_page(self): return self._values[self.LAST_LSN_or_OFFSET_TO_NEXT_PAGE]
 
     @property
-    def flags(self): return reverse_hexlify_int(self.flags_raw)
+    def flags(self): return self._values[self.FLAGS]
 
     @property
-    def page_count(self): return reverse_hexlify_int(self.page_count_raw)
+    def page_count(self): return self._values[self.PAGE_COUNT]
 
     @property
-    def page_position(self): return reverse_hexlify_int(self.page_position_raw)
+    def page_position(self): return self._values[self.PAGE_POSITION]
 
     @property
-    def next_record_offset(self): return reverse_hexlify_int(self.next_record_offset_raw)
+    def next_record_offset(self): return self._values[self.NEXT_RECORD_OFFSET]
 
     @property
-    def last_end_lsn(self): return reverse_hexlify_int(self.last_end_lsn_raw)
+    def last_end_lsn(self): return self._values[self.LAST_END_LSN]
 
     @property
     def fixup_value(self): return hexlify(self.fixup_value_raw)
@@ -338,9 +359,12 @@ class LSNRecordHeader:
     TRANSACTION_ID         = ('transaction ID', 36, 39)
     FLAG                   = ('flag', 40,41 )
     RESERVED               = ('reserved', 42, 47)
+    LAYOUT = StructLayout(THIS_LSN, PREVIOUS_LSN, UNDO_NEXT_LSN, DATA_LENGTH, SEQ_NUMBER, CLIENT_INDEX, RECORD_TYPE,
+                          TRANSACTION_ID, FLAG)
 
     def __init__(self, data, nr, page_nr):
         self.data = data
+        self._values = self.LAYOUT.unpack(data)
         self.length = 48
         self.nr = str(nr)
         self.page_nr = page_nr
@@ -388,31 +412,31 @@ class LSNRecordHeader:
     ####################################################################################################################
     # Interpreted values
     @property
-    def this_lsn(self): return reverse_hexlify_int(self.this_lsn_raw)
+    def this_lsn(self): return self._values[self.THIS_LSN]
 
     @property
-    def previous_lsn(self): return reverse_hexlify_int(self.previous_lsn_raw)
+    def previous_lsn(self): return self._values[self.PREVIOUS_LSN]
 
     @property
-    def undo_next_lsn(self): return reverse_hexlify_int(self.undo_next_lsn_raw)
+    def undo_next_lsn(self): return self._values[self.UNDO_NEXT_LSN]
 
     @property
-    def data_length(self): return reverse_hexlify_int(self.data_length_raw)
+    def data_length(self): return self._values[self.DATA_LENGTH]
 
     @property
-    def seq_number(self): return reverse_hexlify_int(self.seq_number_raw)
+    def seq_number(self): return self._values[self.SEQ_NUMBER]
 
     @property
-    def client_index(self): return reverse_hexlify_int(self.client_index_raw)
+    def client_index(self): return self._values[self.CLIENT_INDEX]
 
     @property
-    def record_type(self): return reverse_hexlify_int(self.record_type_raw)
+    def record_type(self): return self._values[self.RECORD_TYPE]
 
     @property
-    def transaction_id(self): return reverse_hexlify_int(self.transaction_id_raw)
+    def transaction_id(self): return self._values[self.TRANSACTION_ID]
 
     @property
-    def flag(self): return reverse_hexlify_int(self.flag_raw)
+    def flag(self): return self._values[self.FLAG]
 
     # @property
     # def reserved(self): return self.
@@ -517,6 +541,9 @@ class LSNRecordData:
     OPERATION_CODE_DATA    = {'descr': 'data depend on op-code',
                               'start': 40,
                               'end'  : 4031}  # remaining of 4K page
+    LAYOUT = StructLayout(REDO_OPERATION, UNDO_OPERATION, REDO_OFFSET, REDO_LENGTH, UNDO_OFFSET, UNDO_LENGTH,
+                          TARGET_ATTRIBUTE, LCNs_TO_FOLLOW, RECORD_OFFSET, ATTR_OFFSET, MFT_CLUSTER_INDEX, TARGET_VCN,
+                          TARGET_LCN)
 
     def __init__(self, data, nr):
         # delins: data is attached to this object here, but this lsn may actually get popped from the lsn list,
@@ -525,8 +552,12 @@ class LSNRecordData:
         # record there.
         self.data = data
         self.nr = str(nr)
-        self.OPERATION_CODE_DATA['start'] = self.redo_offset
-        self.OPERATION_CODE_DATA['end'] = self.undo_offset + self.undo_length
+        self._values = self.LAYOUT.unpack(data)
+        self._operation_code = None
+        # A copy per record, changing the class dict would give every record the offsets of the last one parsed
+        self.OPERATION_CODE_DATA = dict(self.OPERATION_CODE_DATA,
+                                        start=self.redo_offset,
+                                        end=self.undo_offset + self.undo_length)
 
     def malformed_entry(self):
         return True if self.redo_operation > 37 or \
@@ -598,49 +629,49 @@ class LSNRecordData:
     ####################################################################################################################
     # Interpreted values
     @property
-    def redo_operation(self): return reverse_hexlify_int(self.redo_operation_raw)
+    def redo_operation(self): return self._values[self.REDO_OPERATION]
 
     @property
-    def undo_operation(self): return reverse_hexlify_int(self.undo_operation_raw)
+    def undo_operation(self): return self._values[self.UNDO_OPERATION]
 
     @property
-    def redo_offset(self): return reverse_hexlify_int(self.redo_offset_raw)
+    def redo_offset(self): return self._values[self.REDO_OFFSET]
 
     @property
-    def redo_length(self): return reverse_hexlify_int(self.redo_length_raw)
+    def redo_length(self): return self._values[self.REDO_LENGTH]
 
     @property
-    def undo_offset(self): return reverse_hexlify_int(self.undo_offset_raw)
+    def undo_offset(self): return self._values[self.UNDO_OFFSET]
 
     @property
-    def undo_length(self): return reverse_hexlify_int(self.undo_length_raw)
+    def undo_length(self): return self._values[self.UNDO_LENGTH]
 
     @property
-    def target_attribute(self): return reverse_hexlify_int(self.target_attribute_raw)
+    def target_attribute(self): return self._values[self.TARGET_ATTRIBUTE]
 
     @property
-    def lcns_to_follow(self): return reverse_hexlify_int(self.lcns_to_follow_raw)
+    def lcns_to_follow(self): return self._values[self.LCNs_TO_FOLLOW]
 
     @property
-    def record_offset(self): return reverse_hexlify_int(self.record_offset_raw)
+    def record_offset(self): return self._values[self.RECORD_OFFSET]
 
     @property
-    def attr_offset(self): return reverse_hexlify_int(self.attr_offset_raw)
+    def attr_offset(self): return self._values[self.ATTR_OFFSET]
 
     @property
-    def mft_cluster_index(self): return reverse_hexlify_int(self.mft_cluster_index_raw)
+    def mft_cluster_index(self): return self._values[self.MFT_CLUSTER_INDEX]
 
     # @property
     # def alignment_or_reserved1(self): return self.
 
     @property
-    def target_vcn(self): return reverse_hexlify_int(self.target_vcn_raw)
+    def target_vcn(self): return self._values[self.TARGET_VCN]
 
     # @property
     # def alignment_or_reserved2(self): return self.
 
     @property
-    def target_lcn(self): return reverse_hexlify_int(self.target_lcn_raw)
+    def target_lcn(self): return self._values[self.TARGET_LCN]
 
     # @property
     # def alignment_or_reserved3(self): return self.
@@ -650,8 +681,12 @@ class LSNRecordData:
 
     @property
     def interpret_operation_data(self):
-        return OperationCode(self.redo_operation, self.undo_operation, self.redo_data_raw, self.undo_data_raw,
-                             self.redo_length, self.undo_length, self.deriv_inum)
+        # Interpreted only once, it can hold a fully parsed MFT entry
+        if self._operation_code is None:
+            self._operation_code = OperationCode(self.redo_operation, self.undo_operation, self.redo_data_raw,
+                                                 self.undo_data_raw, self.redo_length, self.undo_length,
+                                                 self.deriv_inum)
+        return self._operation_code
 
     ####################################################################################################################
     # Derived values
@@ -765,14 +800,15 @@ class LSNRecordData:
                   self.deriv_inum
                   ]
 
-        if self.interpret_operation_data.operation_object:
-            if self.interpret_operation_data.operation_type == 'embedded mft':
-                record.extend([self.interpret_operation_data.operation_object.sequence_value, None, None])
-            elif self.interpret_operation_data.operation_type == 'embedded usn':
-                record.extend([None, self.interpret_operation_data.operation_object.usn, None])
-            elif self.interpret_operation_data.operation_type == 'embedded mft attribute' and \
-                    self.interpret_operation_data.operation_object.header.enum == AttributeTypeEnum.FILE_NAME:
-                        record.extend([None, None, self.interpret_operation_data.operation_object.name])
+        operation_code = self.interpret_operation_data
+        if operation_code.operation_object:
+            if operation_code.operation_type == OperationCode.EMBEDDED_MFT:
+                record.extend([operation_code.operation_object.sequence_value, None, None])
+            elif operation_code.operation_type == OperationCode.EMBEDDED_USN:
+                record.extend([None, operation_code.operation_object.usn, None])
+            elif operation_code.operation_type == OperationCode.EMBEDDED_MFT_ATTRIBUTE and \
+                    operation_code.operation_object.header.enum == AttributeTypeEnum.FILE_NAME:
+                        record.extend([None, None, operation_code.operation_object.name])
             else:
                 record.extend([None, None, None])
         else:
@@ -839,6 +875,11 @@ class OperationCode:
     TRANSACTION_TABLE_DUMP           = 32
     UPDATE_RECORD_DATA_ROOT          = 33
 
+    # Values of operation_type, for operations that hold an object
+    EMBEDDED_MFT                     = 'embedded mft'
+    EMBEDDED_MFT_ATTRIBUTE           = 'embedded mft attribute'
+    EMBEDDED_USN                     = 'embedded usn'
+
     def __init__(self, redo_op, undo_op, redo_data, undo_data, redo_length, undo_length, deriv_inum):
         self.operation_type = None
         self.operation_object = None
@@ -847,13 +888,13 @@ class OperationCode:
             pass
         # getting the MFT entry out of the data
         elif redo_op == self.INITIALIZE_FILE_RECORD_SEGMENT and undo_op == self.NO_OPERATION and redo_length > 0 and len(redo_data) > 0:
-            self.operation_type = 'embedded mft'
+            self.operation_type = self.EMBEDDED_MFT
             self.operation_object = MFTEntry(inum=deriv_inum, data=redo_data, logfile_parse=True)
         elif redo_op == self.DELETE_ATTRIBUTE and undo_op == self.CREATE_ATTRIBUTE and undo_length > 0 and len(undo_data) > 0:
-            self.operation_type = 'embedded mft attribute'
+            self.operation_type = self.EMBEDDED_MFT_ATTRIBUTE
             self.operation_object = AttributeFactory.create_attribute(undo_data)
         elif redo_op == self.CREATE_ATTRIBUTE and undo_op == self.DELETE_ATTRIBUTE and redo_length > 0 and len(redo_data) > 0:
-            self.operation_type = 'embedded mft attribute'
+            self.operation_type = self.EMBEDDED_MFT_ATTRIBUTE
             self.operation_object = AttributeFactory.create_attribute(redo_data)
         elif redo_op == self.CREATE_ATTRIBUTE and undo_op == self.DELETE_ATTRIBUTE:
             pass
@@ -865,7 +906,7 @@ class OperationCode:
             record = UsnRecord(redo_data, 0)
             if record:
                 self.operation_object = record
-                self.operation_type = 'embedded usn'
+                self.operation_type = self.EMBEDDED_USN
 
     def writeout_parsed(self, out):
         self.operation_object.writeout_parsed(out)
@@ -11,8 +11,7 @@
 ########################################################################################################################
 
 from binascii import hexlify
-from ntfs_parse import reverse_hexlify_int
-from .logfile_utils import search_fixup, replace_fixup
+from ntfs_parse import reverse_hexlify_int, fixup_mismatches, replace_fixups
 
 
 class RSTRRecord:
@@ -21,11 +20,13 @@ class RSTRRecord:
 
     def __init__(self, data):
         self.header = RestartPageHeader(data[:48])     # 0x00 - 0x2F
-        self.offset_dict = search_fixup(self, data)
-        if self.offset_dict:
-            self.data = replace_fixup(self, data)
-        else:
-            raise Exception('Fixup error')
+        self.fixup_mismatches = fixup_mismatches(data, RestartPageHeader.FIXUP_VALUE[1], self.SECTOR_AMOUNT + 1,
+                                                 self.SECTOR_SIZE)
+        if self.fixup_mismatches:
+            raise Exception('Fixup error in sectors %s' % ', '.join(str(sector) for sector in self.fixup_mismatches))
+        fixed_data = bytearray(data)
+        replace_fixups(fixed_data, RestartPageHeader.FIXUP_VALUE[1], self.SECTOR_AMOUNT + 1, self.SECTOR_SIZE)
+        self.data = bytes(fixed_data)
         self.restart_area = RestartArea(self.data[48:112])  # 0x30 - 0x6F
         self.log_client = LogClient(self.data[112:])        # 0x70 - END (0xC0)
 
@@ -1,13 +1,16 @@
+from collections import deque
+
 from .rcrd_record import OperationCode
 
 
 class Transaction():
     def __init__(self, kickoff_tuple):
-        self.hc_tuples = [kickoff_tuple]
+        # A deque, as transactions grow to the left as well
+        self.hc_tuples = deque([kickoff_tuple])
         self.transaction_num = None
 
     def prepend(self, hc_tuple):
-        self.hc_tuples.insert(0, hc_tuple)
+        self.hc_tuples.appendleft(hc_tuple)
 
     def append(self, hc_tuple):
         self.hc_tuples.append(hc_tuple)
@@ -76,39 +79,37 @@ class Transaction():
             self.last_redo,
             self.last_undo)
 
+    def _operations(self, operation_type):
+        """(header, operation object) of the records that embed an object of operation_type"""
+        return [(h, c.interpret_operation_data.operation_object) for h, c in self.hc_tuples
+                if c.interpret_operation_data.operation_type == operation_type]
+
     @property
     def contains_mft(self):
-        return bool(sum(c.interpret_operation_data.operation_type == 'embedded mft' for _, c in self.hc_tuples))
+        return any(c.interpret_operation_data.operation_type == OperationCode.EMBEDDED_MFT for _, c in self.hc_tuples)
 
     @property
     def contains_mft_attribute(self):
-        return bool(sum(c.interpret_operation_data.operation_type == 'embedded mft attribute' for _, c in self.hc_tuples))
+        return any(c.interpret_operation_data.operation_type == OperationCode.EMBEDDED_MFT_ATTRIBUTE
+                   for _, c in self.hc_tuples)
 
     @property
     def contains_usn(self):
-        return bool(sum(c.interpret_operation_data.operation_type == 'embedded usn' for _, c in self.hc_tuples))
+        return any(c.interpret_operation_data.operation_type == OperationCode.EMBEDDED_USN for _, c in self.hc_tuples)
 
     @property
     def mft_references(self):
-        return [(
-            h.this_lsn,
-            c.interpret_operation_data.operation_object.inum,
-            c.interpret_operation_data.operation_object.sequence_value
-                ) for h, c in self.hc_tuples if c.interpret_operation_data.operation_type == 'embedded mft']
+        return [(h.this_lsn, entry.inum, entry.sequence_value)
+                for h, entry in self._operations(OperationCode.EMBEDDED_MFT)]
 
     @property
     def mft_attributes(self):
-        return [(
-            h.this_lsn,
-            c.interpret_operation_data.operation_object.enum.value
-                ) for h, c in self.hc_tuples if c.interpret_operation_data.operation_type == 'embedded mft attribute']
+        return [(h.this_lsn, attribute.enum.value)
+                for h, attribute in self._operations(OperationCode.EMBEDDED_MFT_ATTRIBUTE)]
 
     @property
     def usns(self):
-        return [(
-            h.this_lsn,
-            c.interpret_operation_data.operation_object.usn
-                ) for h, c in self.hc_tuples if c.interpret_operation_data.operation_type == 'embedded usn']
+        return [(h.this_lsn, record.usn) for h, record in self._operations(OperationCode.EMBEDDED_USN)]
 
     @property
     def all_opcodes(self):
@@ -1,5 +1,6 @@
 from .mft import MFT
 from .mft_entry import MFTEntry
+from .stream import DataStream
 from .common import InumRange, AttributeTypeEnum
 from .attributes import FileName
 from .attribute_headers import AttributeHeaderResident, AttributeHeaderNonResident
@@ -1,7 +1,7 @@
 from binascii import hexlify
-import math
+from bisect import bisect_right
 
-from ntfs_parse import reverse, reverse_hexlify, reverse_hexlify_int, filetime_to_datetime, FileAttributesFlag
+from ntfs_parse import reverse, reverse_hexlify_int, StructLayout
 from .common import _WIDTH, _INDENT, _BIG_BAR, _SMALL_BAR, _INDENTED_SMALL_BAR, AttributeTypeEnum, AttributeTypeEnumConverter
 
 
@@ -13,10 +13,12 @@ class AttributeHeader():
     NAME_OFFSET = ('name offset length', 10, 11)
     FLAGS = ('flags', 12,13)
     ATTRIBUTE_IDENTIFIER = ('attribute identifier', 14, 15)
+    LAYOUT = StructLayout(TYPE_RAW, ATTRIBUTE_LENGTH, NON_RESIDENT_FLAG, NAME_LENGTH, NAME_OFFSET, FLAGS,
+                          ATTRIBUTE_IDENTIFIER)
 
     def __init__(self, data):
-        attribute_length = int(reverse_hexlify(data[4:8]), 16)
-        self.data = data[:attribute_length]
+        self._values = self.LAYOUT.unpack(data)
+        self.data = data[:self._values[AttributeHeader.ATTRIBUTE_LENGTH]]
 
     ####################################################################################################################
     # Raw values
@@ -54,31 +56,31 @@ class AttributeHeader():
 
     @property
     def type(self):
-        return int(reverse_hexlify(self.type_raw), 16)
+        return self._values[AttributeHeader.TYPE_RAW]
 
     @property
     def attribute_length(self):
-        return int(reverse_hexlify(self.attribute_length_raw), 16)
+        return self._values[AttributeHeader.ATTRIBUTE_LENGTH]
 
     @property
     def non_resident_flag(self):
-        return int(reverse_hexlify(self.non_resident_flag_raw), 16)
+        return self._values[AttributeHeader.NON_RESIDENT_FLAG]
 
     @property
     def name_length(self):
-        return int(hexlify(self.name_length_raw), 16)
+        return self._values[AttributeHeader.NAME_LENGTH]
 
     @property
     def name_offset(self):
-        return int(reverse_hexlify(self.name_offset_raw), 16)
+        return self._values[AttributeHeader.NAME_OFFSET]
 
     @property
     def flags(self):
-        return int(reverse_hexlify(self.flags_raw), 16)
+        return self._values[AttributeHeader.FLAGS]
 
     @property
     def attribute_identifier(self):
-        return int(reverse_hexlify(self.attribute_identifier_raw), 16)
+        return self._values[AttributeHeader.ATTRIBUTE_IDENTIFIER]
 
     ####################################################################################################################
     # Derived values
@@ -136,6 +138,7 @@ class AttributeHeader():
 class AttributeHeaderResident(AttributeHeader):
     CONTENT_SIZE = ('content size', 16, 19)
     CONTENT_OFFSET = ('content offset', 20, 21)
+    LAYOUT = StructLayout(*AttributeHeader.LAYOUT.fields, CONTENT_SIZE, CONTENT_OFFSET)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -158,11 +161,11 @@ class AttributeHeaderResident(AttributeHeader):
 
     @property
     def content_size(self):
-        return int(reverse_hexlify(self.content_size_raw), 16)
+        return self._values[AttributeHeaderResident.CONTENT_SIZE]
 
     @property
     def content_offset(self):
-        return int(reverse_hexlify(self.content_offset_raw), 16)
+        return self._values[AttributeHeaderResident.CONTENT_OFFSET]
 
     ####################################################################################################################
     # Derived values
@@ -192,9 +195,15 @@ class RunList():
     def __init__(self, runlist_bytes):
         self.runlist_bytes = runlist_bytes
         self.runs = []
+        # Lookup tables for the translation of virtual to real clusters: the first VCN and the absolute LCN of every
+        # run (None for sparse runs), and the number of clusters in total
+        self.vcn_starts = []
+        self.lcn_starts = []
+        self.vcn_count = 0
         self._parse()
 
     def _parse(self):
+        lcn = 0
         current_runlist = self.runlist_bytes
         while len(current_runlist) > 2 and current_runlist[0] >= 0b00000001:
             run_offset_length = (current_runlist[0] & 0b11110000) >> 4
@@ -207,35 +216,53 @@ class RunList():
                 if run_offset_bytes[0] >= 128:
                     run_offset -= 256 ** len(run_offset_bytes)
             else:
-                run_offset = 0
+                # A run without an offset is sparse, it has no clusters on disk
+                run_offset = None
             run_length = reverse_hexlify_int(current_runlist[1 : 1+run_length_length])
             self.runs.append((run_offset, run_length))
+            self.vcn_starts.append(self.vcn_count)
+            if run_offset is not None:
+                lcn += run_offset
+                self.lcn_starts.append(lcn)
+            else:
+                self.lcn_starts.append(None)
+            self.vcn_count += run_length
             current_runlist = current_runlist[1+run_length_length+run_offset_length:]
 
     @property
     def cleaned_runs(self):
         # In case of a sparse run, skip this one. We don't want to write useless zeros.
         # In some circumstances people choose to include them, because it makes it easier for indexing.
-        return [tup for tup in self.runs if tup[self.RUN_OFFSET] != 0]
+        return [tup for tup in self.runs if tup[self.RUN_OFFSET] is not None]
 
     def to_real_offset(self, virt_offset, cluster_size=4096):
-        """Converts a virtual offset to an actual offset based on the start of the cluster run."""
-
-        offset = 0
-        # see in what run the virtual offset resides
-        virt_cluster = math.floor(virt_offset / cluster_size)
-        virt_cluster_remainder = virt_offset % cluster_size
-
-        # Go through all runs, each time either returning the right location or progressing further looking for it.
-        for run_offset, run_length in self.cleaned_runs:
-            if virt_cluster >= run_length:
-                # the offset we're looking for is beyond this run.
-                offset += run_offset
-                virt_cluster -= run_length
-            else:
-                # The virtual byte offset is in this run. Determine the exact offset.
-                offset += run_offset + virt_cluster
-                return offset * cluster_size + virt_cluster_remainder
+        """Converts a virtual offset to an actual offset based on the start of the cluster run. Returns None when the
+        offset lies in a sparse run or beyond the end of the runlist."""
+        virt_cluster, virt_cluster_remainder = divmod(virt_offset, cluster_size)
+        if virt_cluster < 0 or virt_cluster >= self.vcn_count:
+            return None
+        run = bisect_right(self.vcn_starts, virt_cluster) - 1
+        lcn_start = self.lcn_starts[run]
+        if lcn_start is None:
+            return None
+        return (lcn_start + virt_cluster - self.vcn_starts[run]) * cluster_size + virt_cluster_remainder
+
+    def to_real_offsets(self, virt_offsets, cluster_size=4096):
+        """to_real_offset for many offsets at once. Returns a list in the same order as virt_offsets. The offsets are
+        translated in sorted order, so the search for the run of every offset starts at the run of the previous one."""
+        virt_offsets = list(virt_offsets)
+        real_offsets = [None] * len(virt_offsets)
+        run = 0
+        for index in sorted(range(len(virt_offsets)), key=virt_offsets.__getitem__):
+            virt_cluster, virt_cluster_remainder = divmod(virt_offsets[index], cluster_size)
+            if virt_cluster < 0 or virt_cluster >= self.vcn_count:
+                continue
+            run = bisect_right(self.vcn_starts, virt_cluster, run) - 1
+            lcn_start = self.lcn_starts[run]
+            if lcn_start is not None:
+                real_offsets[index] = (lcn_start + virt_cluster - self.vcn_starts[run]) * cluster_size \
+                                      + virt_cluster_remainder
+        return real_offsets
 
 
 
@@ -248,6 +275,9 @@ class AttributeHeaderNonResident(AttributeHeader):
     ATTRIBUTE_CONTENT_ACTUAL_SIZE = ('attribute content actual size', 48, 55)
     ATTRIBUTE_CONTENT_INITIALIZED_SIZE = ('attribute content initialized size', 56, 63)
     RUNLIST = ('runlist', '?', '+')
+    LAYOUT = StructLayout(*AttributeHeader.LAYOUT.fields, RUNLIST_STARTING_VCN, RUNLIST_ENDING_VCN, RUNLIST_OFFSET,
+                          COMPRESSION_UNIT_SIZE, ATTRIBUTE_CONTENT_ALLOCATED_SIZE, ATTRIBUTE_CONTENT_ACTUAL_SIZE,
+                          ATTRIBUTE_CONTENT_INITIALIZED_SIZE)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -295,32 +325,32 @@ class AttributeHeaderNonResident(AttributeHeader):
 
     @property
     def runlist_starting_vcn(self):
-        return int(reverse_hexlify(self.runlist_starting_vcn_raw), 16)
+        return self._values[AttributeHeaderNonResident.RUNLIST_STARTING_VCN]
 
     @property
     def runlist_ending_vcn(self):
-        return int(reverse_hexlify(self.runlist_starting_vcn_raw), 16)
+        return self._values[AttributeHeaderNonResident.RUNLIST_ENDING_VCN]
 
     @property
     def runlist_offset(self):
-        return int(reverse_hexlify(self.runlist_offset_raw), 16)
+        return self._values[AttributeHeaderNonResident.RUNLIST_OFFSET]
 
     @property
     def compression_unit_size(self):
         # not checked yet if this is correct. see blz 257
-        return int(reverse_hexlify(self.compression_unit_size_raw), 16)
+        return self._values[AttributeHeaderNonResident.COMPRESSION_UNIT_SIZE]
 
     @property
     def attribute_content_allocated_size(self):
-        return int(reverse_hexlify(self.attribute_content_allocated_size_raw), 16)
+        return self._values[AttributeHeaderNonResident.ATTRIBUTE_CONTENT_ALLOCATED_SIZE]
 
     @property
     def attribute_content_actual_size(self):
-        return int(reverse_hexlify(self.attribute_content_actual_size_raw), 16)
+        return self._values[AttributeHeaderNonResident.ATTRIBUTE_CONTENT_ACTUAL_SIZE]
 
     @property
     def attribute_content_initialized_size(self):
-        return int(reverse_hexlify(self.attribute_content_initialized_size_raw), 16)
+        return self._values[AttributeHeaderNonResident.ATTRIBUTE_CONTENT_INITIALIZED_SIZE]
 
     @property
     def runlist(self):
@@ -1,7 +1,7 @@
 from binascii import hexlify
 from collections import OrderedDict
 
-from ntfs_parse import reverse, reverse_hexlify, reverse_hexlify_int, filetime_to_datetime, FileAttributesFlag
+from ntfs_parse import reverse_hexlify_int, filetime_int_to_datetime, FileAttributesFlag, StructLayout
 from .common import _WIDTH, _INDENT, _BIG_BAR, _SMALL_BAR, _INDENTED_SMALL_BAR, AttributeTypeEnumConverter, AttributeTypeEnum
 
 from ntfs_parse import writeout_as_xxd
@@ -98,12 +98,15 @@ class StandardInformation(Attribute):
     SECURITY_ID = ('security id', 52, 55)
     QUOTA_CHARGED = ('quota charged', 56, 63)
     USN = ('USN', 64, 71)
+    LAYOUT = StructLayout(CREATION_TIME, FILE_ALTERED_TIME, MFT_ALTERED_TIME, FILE_ACCESSED_TIME, FLAGS,
+                          MAXIMUM_NUMBER_OF_VERSIONS, VERSION_NUMBER, CLASS_ID, OWNER_ID, SECURITY_ID, QUOTA_CHARGED, USN)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.content_data = self.data[
                             self.header.content_offset:
                             self.header.content_offset + self.header.content_size]
+        self._values = StandardInformation.LAYOUT.unpack(self.content_data)
         self.flags_set = FileAttributesFlag(self.flags)
 
     ####################################################################################################################
@@ -163,51 +166,51 @@ class StandardInformation(Attribute):
 
     @property
     def creation_time(self):
-        return reverse_hexlify_int(self.creation_time_raw)
+        return self._values[StandardInformation.CREATION_TIME]
 
     @property
     def file_altered_time(self):
-        return reverse_hexlify_int(self.file_altered_time_raw)
+        return self._values[StandardInformation.FILE_ALTERED_TIME]
 
     @property
     def mft_altered_time(self):
-        return reverse_hexlify_int(self.mft_altered_time_raw)
+        return self._values[StandardInformation.MFT_ALTERED_TIME]
 
     @property
     def file_accessed_time(self):
-        return reverse_hexlify_int(self.file_accessed_time_raw)
+        return self._values[StandardInformation.FILE_ACCESSED_TIME]
 
     @property
     def flags(self):
-        return reverse_hexlify_int(self.flags_raw)
+        return self._values[StandardInformation.FLAGS]
 
     @property
     def maximum_number_of_versions(self):
-        return reverse_hexlify_int(self.maximum_number_of_versions_raw)
+        return self._values[StandardInformation.MAXIMUM_NUMBER_OF_VERSIONS]
 
     @property
     def version_number(self):
-        return reverse_hexlify_int(self.version_number_raw)
+        return self._values[StandardInformation.VERSION_NUMBER]
 
     @property
     def class_id(self):
-        return reverse_hexlify_int(self.class_id_raw)
+        return self._values[StandardInformation.CLASS_ID]
 
     @property
     def owner_id(self):
-        return reverse_hexlify_int(self.owner_id_raw)
+        return self._values[StandardInformation.OWNER_ID]
 
     @property
     def security_id(self):
-        return reverse_hexlify_int(self.security_id_raw)
+        return self._values[StandardInformation.SECURITY_ID]
 
     @property
     def quota_charged(self):
-        return reverse_hexlify_int(self.quota_charged_raw)
+        return self._values[StandardInformation.QUOTA_CHARGED]
 
     @property
     def usn(self):
-        return reverse_hexlify_int(self.usn_raw)
+        return self._values[StandardInformation.USN]
 
 
     ####################################################################################################################
@@ -216,25 +219,25 @@ class StandardInformation(Attribute):
     @property
     def creation_time_datetime(self):
         if not hasattr(self, '_creation_time_datetime'):
-            self._creation_time_datetime = filetime_to_datetime(self.creation_time_raw)
+            self._creation_time_datetime = filetime_int_to_datetime(self.creation_time)
         return self._creation_time_datetime
 
     @property
     def file_altered_time_datetime(self):
         if not hasattr(self, '_file_altered_time_datetime'):
-            self._file_altered_time_datetime = filetime_to_datetime(self.file_altered_time_raw)
+            self._file_altered_time_datetime = filetime_int_to_datetime(self.file_altered_time)
         return self._file_altered_time_datetime
 
     @property
     def mft_altered_time_datetime(self):
         if not hasattr(self, '_mft_altered_time_datetime'):
-            self._mft_altered_time_datetime = filetime_to_datetime(self.mft_altered_time_raw)
+            self._mft_altered_time_datetime = filetime_int_to_datetime(self.mft_altered_time)
         return self._mft_altered_time_datetime
 
     @property
     def file_accessed_time_datetime(self):
         if not hasattr(self, '_file_accessed_time_datetime'):
-            self._file_accessed_time_datetime = filetime_to_datetime(self.file_accessed_time_raw)
+            self._file_accessed_time_datetime = filetime_int_to_datetime(self.file_accessed_time)
         return self._file_accessed_time_datetime
 
     @property
@@ -340,12 +343,17 @@ class FileName(Attribute):
     NAME_LENGTH = ('name length', 64, 64)
     NAMESPACE = ('namespace', 65, 65)
     NAME = ('name', 66, '+')
+    NAMESPACE_DOS = 2
+    LAYOUT = StructLayout(PARENT_DIRECTORY_FILE, FILE_CREATION_TIME, FILE_MODIFICATION_TIME, MFT_MODIFICATION_TIME,
+                          FILE_ACCESS_TIME, FILE_ALLOCATED_SIZE, FILE_REAL_SIZE, FLAGS, REPARSE_VALUE, NAME_LENGTH,
+                          NAMESPACE)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.content_data = self.data[
                             self.header.content_offset:
                             self.header.content_offset + self.header.content_size]
+        self._values = FileName.LAYOUT.unpack(self.content_data)
         self.flags_set = FileAttributesFlag(self.flags)
 
     ####################################################################################################################
@@ -408,43 +416,43 @@ class FileName(Attribute):
 
     @property
     def file_creation_time(self):
-        return reverse_hexlify_int(self.file_creation_time_raw)
+        return self._values[FileName.FILE_CREATION_TIME]
 
     @property
     def file_modification_time(self):
-        return reverse_hexlify_int(self.file_modification_time_raw)
+        return self._values[FileName.FILE_MODIFICATION_TIME]
 
     @property
     def mft_modification_time(self):
-        return reverse_hexlify_int(self.mft_modification_time_raw)
+        return self._values[FileName.MFT_MODIFICATION_TIME]
 
     @property
     def file_access_time(self):
-        return reverse_hexlify_int(self.file_access_time_raw)
+        return self._values[FileName.FILE_ACCESS_TIME]
 
     @property
     def file_allocated_size(self):
-        return reverse_hexlify_int(self.file_allocated_size_raw)
+        return self._values[FileName.FILE_ALLOCATED_SIZE]
 
     @property
     def file_real_size(self):
-        return reverse_hexlify_int(self.file_allocated_size_raw)
+        return self._values[FileName.FILE_REAL_SIZE]
 
     @property
     def flags(self):
-        return reverse_hexlify_int(self.flags_raw)
+        return self._values[FileName.FLAGS]
 
     @property
     def reparse_value(self):
-        return reverse_hexlify_int(self.reparse_value_raw)
+        return self._values[FileName.REPARSE_VALUE]
 
     @property
     def name_length(self):
-        return reverse_hexlify_int(self.name_length_raw)
+        return self._values[FileName.NAME_LENGTH]
 
     @property
     def namespace(self):
-        return reverse_hexlify_int(self.namespace_raw)
+        return self._values[FileName.NAMESPACE]
 
     @property
     def name(self):
@@ -455,17 +463,17 @@ class FileName(Attribute):
 
     @property
     def parent_directory_file_reference_sequence_number(self):
-        return reverse_hexlify_int(self.parent_directory_file_reference_raw[6:8])
+        return self._values[FileName.PARENT_DIRECTORY_FILE] >> 48
 
     @property
     def parent_directory_file_reference_mft_entry(self):
-        return reverse_hexlify_int(self.parent_directory_file_reference_raw[0:6])
+        return self._values[FileName.PARENT_DIRECTORY_FILE] & 0xffffffffffff
 
     @property
     def file_creation_time_datetime(self):
         try:
             if not hasattr(self, '_file_creation_time_datetime'):
-                self._file_creation_time_datetime = filetime_to_datetime(self.file_creation_time_raw)
+                self._file_creation_time_datetime = filetime_int_to_datetime(self.file_creation_time)
             return self._file_creation_time_datetime
         except ValueError:
             return None
@@ -474,7 +482,7 @@ class FileName(Attribute):
     def file_modification_time_datetime(self):
         try:
             if not hasattr(self, '_file_modification_time_datetime'):
-                self._file_modification_time_datetime = filetime_to_datetime(self.file_modification_time_raw)
+                self._file_modification_time_datetime = filetime_int_to_datetime(self.file_modification_time)
             return self._file_modification_time_datetime
         except ValueError:
             return None
@@ -482,7 +490,7 @@ class FileName(Attribute):
     def mft_modification_time_datetime(self):
         try:
             if not hasattr(self, '_mft_modification_time_datetime'):
-                self._mft_modification_time_datetime = filetime_to_datetime(self.mft_modification_time_raw)
+                self._mft_modification_time_datetime = filetime_int_to_datetime(self.mft_modification_time)
             return self._mft_modification_time_datetime
         except ValueError:
             return None
@@ -490,7 +498,7 @@ class FileName(Attribute):
     def file_access_time_datetime(self):
         try:
             if not hasattr(self, '_file_access_time_datetime'):
-                self._file_access_time_datetime = filetime_to_datetime(self.file_access_time_raw)
+                self._file_access_time_datetime = filetime_int_to_datetime(self.file_access_time)
             return self._file_access_time_datetime
         except ValueError:
             return None
@@ -507,7 +515,7 @@ class FileName(Attribute):
             (FileName.PARENT_DIRECTORY_FILE, self.parent_directory_file_reference, self.parent_directory_file_reference_raw),
             (FileName.FILE_CREATION_TIME, self.file_creation_time, self.file_creation_time_raw),
             (FileName.FILE_MODIFICATION_TIME, self.file_modification_time, self.file_modification_time_raw),
-            (FileName.MFT_MODIFICATION_TIME, self.mft_modification_time, self.file_modification_time_raw),
+            (FileName.MFT_MODIFICATION_TIME, self.mft_modification_time, self.mft_modification_time_raw),
             (FileName.FILE_ACCESS_TIME, self.file_access_time, self.file_access_time_raw),
             (FileName.FILE_ALLOCATED_SIZE, self.file_allocated_size, self.file_allocated_size_raw),
             (FileName.FILE_REAL_SIZE, self.file_real_size, self.file_real_size_raw),
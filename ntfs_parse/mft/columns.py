@@ -0,0 +1,205 @@
+########################################################################################################################
+# Columnar MFT table
+#
+# Keeps only the fixed width fields of every valid MFT entry in a single NumPy structured array, one row per entry, and
+# the file names in a list next to it. The table is built straight from the raw entries, no MFTEntry or attribute
+# objects are created, which makes it a lot smaller than a fully parsed MFT. Filtering is done with NumPy masks:
+#
+#   columns = mft.to_columns()
+#   mask = columns.between('si_file_altered_time', start, end) & (columns['parent_inum'] == 5)
+#   for row, name in columns.select(mask):
+#       ...
+#
+# NumPy is only needed when this module is imported.
+########################################################################################################################
+
+from datetime import datetime
+
+import numpy
+
+from ntfs_parse import datetime_to_filetime, replace_fixups
+from .common import AttributeTypeEnum, AttributeTypeEnumConverter
+from .mft_entry import MFTEntry
+from .attributes import StandardInformation, FileName
+from .attribute_headers import AttributeHeader, AttributeHeaderResident
+
+
+COLUMNS_DTYPE = numpy.dtype([
+    ('inum', '<u8'),
+    ('sequence_value', '<u2'),
+    ('flags', '<u2'),
+    ('link_count', '<u2'),
+    ('base_reference', '<u8'),
+    ('has_standard_information', '?'),
+    ('si_creation_time', '<u8'),
+    ('si_file_altered_time', '<u8'),
+    ('si_mft_altered_time', '<u8'),
+    ('si_file_accessed_time', '<u8'),
+    ('has_file_name', '?'),
+    ('parent_inum', '<u8'),
+    ('parent_sequence', '<u2'),
+    ('fn_allocated_size', '<u8'),
+    ('fn_real_size', '<u8'),
+    ('fn_creation_time', '<u8'),
+    ('fn_modification_time', '<u8'),
+    ('fn_mft_modification_time', '<u8'),
+    ('fn_access_time', '<u8'),
+])
+
+# Columns that come from the entry header
+_HEADER_COLUMNS = (
+    ('sequence_value', MFTEntry.SEQUENCE_VALUE),
+    ('flags', MFTEntry.FLAGS),
+    ('link_count', MFTEntry.LINK_COUNT),
+    ('base_reference', MFTEntry.FILE_REFERENCE_TO_BASE_RECORD),
+)
+
+# Columns that come from the attributes, in the order _parse_attributes returns them
+_ATTRIBUTE_COLUMNS = COLUMNS_DTYPE.names[COLUMNS_DTYPE.names.index('has_standard_information'):]
+
+_END_OF_ATTRIBUTES = 0xFFFFFFFF
+_NO_STANDARD_INFORMATION = (False, 0, 0, 0, 0)
+_NO_FILE_NAME = (False, 0, 0, 0, 0, 0, 0, 0, 0)
+
+
+def _header_dtype(mft_entry_size):
+    """dtype that reads the entry headers of a whole run at once"""
+    fields = (('signature', MFTEntry.SIGNATURE),) + _HEADER_COLUMNS
+    return numpy.dtype({
+        'names': [name for name, field in fields],
+        'formats': ['S4' if name == 'signature' else '<u%d' % (field[2] - field[1] + 1) for name, field in fields],
+        'offsets': [field[1] for name, field in fields],
+        'itemsize': mft_entry_size
+    })
+
+
+def _replace_fixup_values(data):
+    values = MFTEntry.LAYOUT.unpack(data)
+    replace_fixups(data, values[MFTEntry.OFFSET_TO_FIXUP_ARRAY], values[MFTEntry.NUMBER_OF_ENTRIES_IN_FIXUP_ARRAY])
+
+
+def _parse_attributes(data):
+    """Walks the attributes of a single entry. Returns the attribute columns of its first $STANDARD_INFORMATION and
+    first $FILE_NAME attribute and the file name."""
+    standard_information = _NO_STANDARD_INFORMATION
+    file_name = _NO_FILE_NAME
+    name = None
+
+    attribute_offset = MFTEntry.LAYOUT.unpack(data)[MFTEntry.OFFSET_TO_FIRST_ATTRIBUTE]
+    while attribute_offset + AttributeHeaderResident.LAYOUT.size <= len(data):
+        header = AttributeHeaderResident.LAYOUT.unpack(data, attribute_offset)
+        attribute_type = header[AttributeHeader.TYPE_RAW]
+        if attribute_type == _END_OF_ATTRIBUTES or header[AttributeHeader.ATTRIBUTE_LENGTH] == 0:
+            break
+        # Both attributes are always resident
+        if not header[AttributeHeader.NON_RESIDENT_FLAG]:
+            content_offset = attribute_offset + header[AttributeHeaderResident.CONTENT_OFFSET]
+            type_enum = AttributeTypeEnumConverter.from_identifier(attribute_type)
+            if type_enum == AttributeTypeEnum.STANDARD_INFORMATION and standard_information is _NO_STANDARD_INFORMATION:
+                values = StandardInformation.LAYOUT.unpack(data, content_offset)
+                standard_information = (True,
+                                        values[StandardInformation.CREATION_TIME],
+                                        values[StandardInformation.FILE_ALTERED_TIME],
+                                        values[StandardInformation.MFT_ALTERED_TIME],
+                                        values[StandardInformation.FILE_ACCESSED_TIME])
+            elif type_enum == AttributeTypeEnum.FILE_NAME and file_name is _NO_FILE_NAME:
+                values = FileName.LAYOUT.unpack(data, content_offset)
+                parent = values[FileName.PARENT_DIRECTORY_FILE]
+                file_name = (True,
+                             parent & 0xffffffffffff,
+                             parent >> 48,
+                             values[FileName.FILE_ALLOCATED_SIZE],
+                             values[FileName.FILE_REAL_SIZE],
+                             values[FileName.FILE_CREATION_TIME],
+                             values[FileName.FILE_MODIFICATION_TIME],
+                             values[FileName.MFT_MODIFICATION_TIME],
+                             values[FileName.FILE_ACCESS_TIME])
+                name_offset = content_offset + FileName.NAME[1]
+                name = bytes(data[name_offset : name_offset + 2 * values[FileName.NAME_LENGTH]]).decode('utf-16',
+                                                                                                       'replace')
+        attribute_offset += header[AttributeHeader.ATTRIBUTE_LENGTH]
+
+    return standard_information + file_name, name
+
+
+def build_columns(mft):
+    """Builds the MFTColumns of all valid entries of an MFT object, straight from its mapped data runs."""
+    entry_size = mft.mft_entry_size
+    header_dtype = _header_dtype(entry_size)
+
+    # First pass: the headers of every run, to know how many valid entries there are
+    runs = []
+    n_rows = 0
+    for mapped, start, first_inum in mft.mapped_runs():
+        count = (len(mapped) - start) // entry_size
+        headers = numpy.frombuffer(mapped, dtype=header_dtype, count=count, offset=start)
+        valid_indices = numpy.flatnonzero(headers['signature'] == b'FILE')
+        runs.append((mapped, start, first_inum, headers, valid_indices))
+        n_rows += len(valid_indices)
+
+    table = numpy.zeros(n_rows, dtype=COLUMNS_DTYPE)
+    names = []
+    row = 0
+    for mapped, start, first_inum, headers, valid_indices in runs:
+        n_valid = len(valid_indices)
+        table['inum'][row:row + n_valid] = first_inum + valid_indices
+        for name, field in _HEADER_COLUMNS:
+            table[name][row:row + n_valid] = headers[name][valid_indices]
+
+        # Second pass: the attributes, which have to be walked one entry at a time
+        for chunk in range(0, n_valid, mft.CHUNK_ENTRIES):
+            chunk_indices = valid_indices[chunk:chunk + mft.CHUNK_ENTRIES]
+            attribute_rows = []
+            for index in chunk_indices.tolist():
+                entry_offset = start + index * entry_size
+                data = bytearray(mapped[entry_offset:entry_offset + entry_size])
+                _replace_fixup_values(data)
+                attribute_row, name = _parse_attributes(data)
+                attribute_rows.append(attribute_row)
+                names.append(name)
+            block = numpy.array(attribute_rows, dtype=COLUMNS_DTYPE[list(_ATTRIBUTE_COLUMNS)])
+            block_start = row + chunk
+            for name in _ATTRIBUTE_COLUMNS:
+                table[name][block_start:block_start + len(block)] = block[name]
+        row += n_valid
+
+    return MFTColumns(table, names)
+
+
+class MFTColumns():
+    """The fixed width fields of the valid MFT entries in a NumPy structured array (table) and their names in a list
+    (names), both ordered by inum. Timestamps are kept as FILETIME integers."""
+
+    def __init__(self, table=None, names=None):
+        self.table = table
+        self.names = names
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, column):
+        return self.table[column]
+
+    def __iter__(self):
+        return zip(self.table, self.names)
+
+    def between(self, column, start=None, end=None):
+        """Mask of the rows where a timestamp column lies in [start, end). start and end can be datetimes or FILETIME
+        integers, leaving one out leaves that side of the window open."""
+        mask = numpy.ones(len(self.table), dtype=bool)
+        if start is not None:
+            mask &= self.table[column] >= (datetime_to_filetime(start) if isinstance(start, datetime) else start)
+        if end is not None:
+            mask &= self.table[column] < (datetime_to_filetime(end) if isinstance(end, datetime) else end)
+        return mask
+
+    def select(self, mask):
+        """Returns a new MFTColumns with only the rows in mask"""
+        return MFTColumns(self.table[mask], [self.names[i] for i in numpy.flatnonzero(mask).tolist()])
+
+    def row_of(self, inum):
+        """Row number of an inum, or None if the inum isn't in the table"""
+        row = int(numpy.searchsorted(self.table['inum'], inum))
+        if row < len(self.table) and self.table['inum'][row] == inum:
+            return row
+        return None
@@ -19,19 +19,75 @@
 ########################################################################################################################
 
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import csv
+import io
+import mmap
 import sys
 import os
 
+from ntfs_parse import copy_range, skip_range
 from .factories import AttributeTypeEnum
+from .common import InumRange
 from .mft_entry import MFTEntry
 from .attribute_headers import RunList
+from .attributes import FileName
+from .stream import DataStream
+
+
+def _read_entries(f, image_byte_offset, first_inum, count, mft_entry_size, lazy):
+    """Reads count consecutive entries starting at image_byte_offset with a single read and returns them parsed, in a
+    list"""
+    f.seek(image_byte_offset)
+    data = f.read(count * mft_entry_size)
+    return [MFTEntry(inum=first_inum + i,
+                     image_byte_offset=image_byte_offset + i * mft_entry_size,
+                     data=data[i * mft_entry_size:(i + 1) * mft_entry_size],
+                     lazy=lazy)
+            for i in range(len(data) // mft_entry_size)]
+
+
+def _parsed_text(entry):
+    out = io.StringIO()
+    entry.writeout_parsed(out)
+    return out.getvalue()
+
+
+# What the workers of the parallel parse send back for every entry. Complete entries would take longer to pickle and
+# unpickle than to parse, so they send the lazy state, or just the output that is asked for.
+_CHUNK_FORMS = {
+    'lazy': MFTEntry.lazy_state,
+    'csv': MFTEntry.format_csv,
+    'parsed': _parsed_text,
+}
+
+
+def _parse_mft_chunk(image_name, image_byte_offset, first_inum, count, mft_entry_size, include_invalid, form):
+    """Worker for the parallel parse. Parses count entries from image_byte_offset and returns (inum, value) for every
+    entry, where value is the form of the entry from _CHUNK_FORMS."""
+    with open(image_name, 'rb') as f:
+        entries = _read_entries(f, image_byte_offset, first_inum, count, mft_entry_size, lazy=form == 'lazy')
+    return [(entry.inum, _CHUNK_FORMS[form](entry)) for entry in entries if include_invalid or entry.is_valid]
+
 
 class MFT():
     MFT = 0
+    # Number of bytes of the mapped $MFT that stay resident while parsing
+    RELEASE_SIZE = 16 * 1024 * 1024
+    # Number of entries a worker parses at once in the parallel parse
+    CHUNK_ENTRIES = 4096
+    # The inums reserved for the NTFS system files ($MFT up to $Extend and the ones after it)
+    SYSTEM_FILES = 16
+    LOGFILE = 2
+    ROOT = 5
+    EXTEND = 11
+    # Where entries end up whose parent directory can't be found anymore
+    ORPHAN_DIRECTORY = '\\$OrphanFiles'
 
-    def __init__(self, image_name=None, boot_sector=None):
+    def __init__(self, image_name=None, boot_sector=None, cache=None):
         self.image_name = image_name
+        self.cache = cache
         self.mft_offset_bytes = boot_sector.byte_offset + boot_sector.mft_starting_cluster * boot_sector.cluster_size
         self.partition_offset_bytes = boot_sector.byte_offset
         self.sector_size = boot_sector.bytes_per_sector
@@ -39,7 +95,19 @@ class MFT():
         self.mft_entry_size = boot_sector.mft_entry_size
         self.entries = OrderedDict()
         self.invalid_entries = OrderedDict()
-        self.mft = self._parse_mft()
+        self._mft_maps = None
+        self._mft_first_inums = None
+        self._name_table = None
+        # Paths of the directories that have been resolved so far. The root has no name of its own.
+        self._directory_paths = {MFT.ROOT: ''}
+        self._mft = None
+
+    @property
+    def mft(self):
+        """The entry of $MFT itself. It's only parsed when it's needed, with a cache its runlist is read from there."""
+        if self._mft is None:
+            self._mft = self._parse_mft()
+        return self._mft
 
     def _parse_mft(self):
         with open(self.image_name, 'rb') as f:
@@ -47,121 +115,408 @@ class MFT():
             image_byte_offset = self.mft_offset_bytes
             return MFTEntry(inum=0, image_byte_offset=image_byte_offset, data=f.read(self.mft_entry_size))
 
-    def parse_all(self, num=None):
+    def _cached(self, name, create):
+        """Returns the value stored as name in the cache. Without a cache, or when it isn't in there yet, it's created
+        with create()."""
+        if self.cache is None:
+            return create()
+        value = self.cache.load(name)
+        if value is None:
+            value = self.cache.store(name, create())
+        return value
+
+    def _map_mft_runs(self):
+        """Maps every data run of $MFT into memory once. Returns a list of (image byte offset, mmap, offset in mmap)
+        tuples, one for each run."""
+        if self._mft_maps is not None:
+            return self._mft_maps
+
+        self._mft_maps = []
+        self._mft_first_inums = []
+        first_inum = 0
+        mft_runs = self.mft_runlist().cleaned_runs
         with open(self.image_name, 'rb') as f:
-            f.seek(self.mft_offset_bytes)
+            image_size = os.fstat(f.fileno()).st_size
+            offset = 0
+            for run_offset, run_length in mft_runs:
+                # The offsets in the runlist are relative to the previous run
+                offset += run_offset * self.cluster_size
+                image_byte_offset = self.partition_offset_bytes + offset
+                length = int(run_length * self.cluster_size / self.mft_entry_size) * self.mft_entry_size
+                # Block devices report a size of 0, in that case trust the runlist
+                if image_size:
+                    length = min(length, image_size - image_byte_offset)
+                if length <= 0:
+                    continue
+                # mmap offsets have to be a multiple of the allocation granularity
+                map_offset = image_byte_offset - image_byte_offset % mmap.ALLOCATIONGRANULARITY
+                mapped = mmap.mmap(f.fileno(), length + image_byte_offset - map_offset,
+                                   access=mmap.ACCESS_READ, offset=map_offset)
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                self._mft_maps.append((image_byte_offset, mapped, image_byte_offset - map_offset))
+                self._mft_first_inums.append(first_inum)
+                first_inum += length // self.mft_entry_size
+        return self._mft_maps
+
+    def close(self):
+        """Unmaps the data runs of $MFT, they are mapped again when they are needed. Invalid entries in
+        invalid_entries point into them, they get a copy of their data first. A run that other invalid entries still
+        point into is unmapped once they are gone."""
+        if self._mft_maps is None:
+            return
+        for entry in self.invalid_entries.values():
+            if isinstance(entry.data, memoryview):
+                entry.data = bytes(entry.data)
+        for image_byte_offset, mapped, start in self._mft_maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        self._mft_maps = None
+        self._mft_first_inums = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-            mft = MFTEntry(inum=0, image_byte_offset=self.mft_offset_bytes, data=f.read(self.mft_entry_size))
+    def mft_runlist(self):
+        """RunList of the $DATA attribute of $MFT"""
+        return self._cached('mft_runlist',
+                            lambda: self.mft.attributes[AttributeTypeEnum.DATA][0].header.runlist_extended)
 
-            mft_runs = mft.attributes[AttributeTypeEnum.DATA][0].header.runlist_extended.cleaned_runs
+    def _entry_offsets(self, inums):
+        """Image byte offsets of the entries of inums, in the same order. None for inums outside of $MFT."""
+        real_offsets = self.mft_runlist().to_real_offsets([inum * self.mft_entry_size for inum in inums],
+                                                          self.cluster_size)
+        return [None if real_offset is None else self.partition_offset_bytes + real_offset
+                for real_offset in real_offsets]
 
-            inum = 0
+    def mapped_runs(self):
+        """Yields (mapping, offset of the first entry in the mapping, inum of the first entry) for every data run of
+        $MFT, in inum order. The mappings are read-only and stay open until close()."""
+        for (image_byte_offset, mapped, start), first_inum in zip(self._map_mft_runs(), self._mft_first_inums):
+            yield mapped, start, first_inum
 
-            run = mft_runs[0]
-            offset = run[RunList.RUN_OFFSET] * self.cluster_size
-            length = run[RunList.RUN_LENGTH]
+    def _create_entry(self, inum, lazy=False):
+        """Parses a single entry. Returns None when the inum lies outside of $MFT."""
+        image_byte_offset = self._entry_offsets([inum])[0]
+        if image_byte_offset is None:
+            return None
+        with open(self.image_name, 'rb') as f:
+            entries = _read_entries(f, image_byte_offset, inum, 1, self.mft_entry_size, lazy)
+        return entries[0] if entries else None
+
+    def _inum_extents(self, inums):
+        """Merges inums into extents that are contiguous in the image, sorted by their offset in the image. An extent
+        is at most RELEASE_SIZE bytes. Returns a list of (image byte offset, first inum, number of entries) tuples.
+        Inums outside of $MFT are left out."""
+        max_entries = MFT.RELEASE_SIZE // self.mft_entry_size
+        inums = sorted(set(inums))
+        located = [(image_byte_offset, inum) for image_byte_offset, inum in zip(self._entry_offsets(inums), inums)
+                   if image_byte_offset is not None]
+        located.sort()
+
+        extents = []
+        for image_byte_offset, inum in located:
+            if extents:
+                extent_offset, first_inum, count = extents[-1]
+                if image_byte_offset == extent_offset + count * self.mft_entry_size and inum == first_inum + count \
+                        and count < max_entries:
+                    extents[-1] = (extent_offset, first_inum, count + 1)
+                    continue
+            extents.append((image_byte_offset, inum, 1))
+        return extents
+
+    def _mft_chunks(self):
+        """Splits the data runs of $MFT into chunks of at most CHUNK_ENTRIES entries. Returns a list of
+        (image byte offset, first inum, number of entries) tuples. A chunk never crosses a run boundary."""
+        chunks = []
+        for (image_byte_offset, mapped, start), first_inum in zip(self._map_mft_runs(), self._mft_first_inums):
+            run_entries = (len(mapped) - start) // self.mft_entry_size
+            for first in range(0, run_entries, MFT.CHUNK_ENTRIES):
+                chunks.append((image_byte_offset + first * self.mft_entry_size,
+                               first_inum + first,
+                               min(MFT.CHUNK_ENTRIES, run_entries - first)))
+        return chunks
+
+    def _iter_parallel(self, form, include_invalid=False, workers=None):
+        """Parses the whole $MFT in worker processes. Yields (inum, value) in inum order, see _parse_mft_chunk."""
+        chunks = self._mft_chunks()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map hands back the chunks in the order they were submitted, so the entries stay in inum order
+            for values in executor.map(_parse_mft_chunk,
+                                       [self.image_name] * len(chunks),
+                                       [image_byte_offset for image_byte_offset, _, _ in chunks],
+                                       [first_inum for _, first_inum, _ in chunks],
+                                       [count for _, _, count in chunks],
+                                       [self.mft_entry_size] * len(chunks),
+                                       [include_invalid] * len(chunks),
+                                       [form] * len(chunks)):
+                yield from values
+
+    def iter_entries(self, inum_range=None, include_invalid=False, lazy=False, workers=None):
+        """Generator that parses and yields one MFTEntry at a time, without storing them. Walks the whole $MFT, or
+        only the inums in inum_range when given. With lazy, the attributes are only parsed when they are accessed.
+        With more than one worker, the whole $MFT is parsed in that many processes. The workers only send back what
+        a lazy entry needs, so the entries are always lazy then. The inums in inum_range are parsed in the order they
+        are stored in the image, each only once."""
+        if workers and workers > 1 and not inum_range:
+            for inum, state in self._iter_parallel('lazy', include_invalid=include_invalid, workers=workers):
+                yield MFTEntry.from_lazy_state(state)
+            return
+
+        if inum_range:
+            # Every extent of neighbouring inums is read at once, in the order they are found in the image
+            with open(self.image_name, 'rb') as f:
+                for image_byte_offset, first_inum, count in self._inum_extents(inum_range.iterate):
+                    for entry in _read_entries(f, image_byte_offset, first_inum, count, self.mft_entry_size, lazy):
+                        if include_invalid or entry.is_valid:
+                            yield entry
+            return
 
-            for run_index in range(len(mft_runs)):
-                if run_index:
-                    run = mft_runs[run_index]
-                    offset = offset + run[RunList.RUN_OFFSET] * self.cluster_size
-                    length = run[RunList.RUN_LENGTH]
+        inum = 0
+        for image_byte_offset, mapped, start in self._map_mft_runs():
+            view = memoryview(mapped)
+            released = 0
+            for map_offset in range(start, len(mapped) - self.mft_entry_size + 1, self.mft_entry_size):
+                # The entry gets a slice of the mapping, it only copies the data when it turns out to be valid
+                entry = MFTEntry(inum=inum,
+                                 image_byte_offset=image_byte_offset + map_offset - start,
+                                 data=view[map_offset:map_offset + self.mft_entry_size],
+                                 lazy=lazy)
+                inum += 1
+                if include_invalid or entry.is_valid:
+                    yield entry
 
-                f.seek(self.partition_offset_bytes + offset)
+                # Give back the pages we're done with, after every RELEASE_SIZE bytes of entries. They are read from
+                # the image again when they are needed. The first entry doesn't have to start at a page boundary, only
+                # the pages before the next entry are released.
+                window_end = map_offset - start + self.mft_entry_size
+                if window_end % MFT.RELEASE_SIZE == 0 and hasattr(mmap, 'MADV_DONTNEED'):
+                    release_end = start + window_end - (start + window_end) % mmap.PAGESIZE
+                    mapped.madvise(mmap.MADV_DONTNEED, released, release_end - released)
+                    released = release_end
 
-                n_entries = int(length * self.cluster_size / self.mft_entry_size)
+    def parse_all(self, num=None, lazy=False, workers=None):
+        for entry in islice(self.iter_entries(include_invalid=True, lazy=lazy, workers=workers), num):
+            if entry.is_valid:
+                self.entries[entry.inum] = entry
+            else:
+                self.invalid_entries[entry.inum] = entry
 
-                for i in range(n_entries):
-                    entry = MFTEntry(inum=inum,
-                                    image_byte_offset=self.partition_offset_bytes + offset + i * self.cluster_size,
-                                    data=f.read(self.mft_entry_size))
-                    if entry.is_valid:
-                        self.entries[inum] = entry
-                    else:
-                        self.invalid_entries[inum] = entry
-                    inum += 1
-                    if inum == num:
-                        break
+    def to_columns(self):
+        """Returns the fixed width fields of all valid entries as an MFTColumns table, without creating MFTEntry
+        objects. Needs NumPy."""
+        from .columns import build_columns
+        return self._cached('columns', lambda: build_columns(self))
+
+    def system_runlists(self):
+        """Dictionary with the runs and the actual size of the first $DATA stream of every system file that has a non
+        resident one"""
+        return self._cached('system_runlists', self._create_system_runlists)
+
+    def _create_system_runlists(self):
+        runlists = {}
+        for entry in self.iter_entries(inum_range=InumRange('0-%d' % (MFT.SYSTEM_FILES - 1))):
+            if AttributeTypeEnum.DATA in entry.attributes:
+                data_stream = entry.attributes[AttributeTypeEnum.DATA][0]
+                if not data_stream.header.is_resident:
+                    runlists[entry.inum] = (data_stream.header.runlist_extended.runs,
+                                            data_stream.header.attribute_content_actual_size)
+        return runlists
 
     def parse_inum(self, inum):
-        runlist = self.mft.attributes[AttributeTypeEnum.DATA][0].header.runlist_extended
-        with open(self.image_name, 'rb') as f:
-            image_byte_offset = self.partition_offset_bytes + runlist.to_real_offset(inum * self.mft_entry_size, cluster_size=self.cluster_size)
-            f.seek(image_byte_offset)
-            entry = MFTEntry(inum=inum, image_byte_offset=image_byte_offset, data=f.read(self.mft_entry_size))
+        entry = self._create_entry(inum)
+        if entry is not None:
             self.entries[inum] = entry
 
     def parse_inums(self, inum_range=None):
-        runlist = self.mft.attributes[AttributeTypeEnum.DATA][0].header.runlist_extended
-        with open(self.image_name, 'rb') as f:
-            # inum_ranges may look like [(0,11), (24,23), (40,40)]
-            for first, last in inum_range.ranges:
-                for inum in range(first, last + 1):
-                    image_byte_offset = self.partition_offset_bytes + runlist.to_real_offset(inum * self.mft_entry_size, cluster_size=self.cluster_size)
-                    f.seek(image_byte_offset)
-                    entry = MFTEntry(inum=inum, image_byte_offset=image_byte_offset, data=f.read(self.mft_entry_size))
-                    self.entries[inum] = entry
-                    image_byte_offset += self.mft_entry_size
+        # inum_ranges may look like [(0,11), (24,23), (40,40)]
+        for entry in self.iter_entries(inum_range=inum_range, include_invalid=True):
+            self.entries[entry.inum] = entry
 
     def max_inum(self):
         return max(self.entries.keys(), key=int)
 
-    def export_parsed(self, inum_range=None, export_file=None):
-        if inum_range:
-            iterator = inum_range.iterate
-        else:
-            iterator = self.entries.keys()        # 1) Write to file. Open file and pass descriptor
+    def _export(self, name, export_file, write):
+        """Writes the output of write(out) to export_file, or to stdout without one. With a cache the output is stored
+        there as name the first time, later exports copy it from there. Outputs without a name are not cached."""
+        if self.cache is not None and name is not None:
+            if not self.cache.has_output(name):
+                self.cache.store_output(name, write)
+            if export_file:
+                with open(export_file, 'wb') as f:
+                    self.cache.copy_output(name, f)
+            else:
+                sys.stdout.flush()
+                self.cache.copy_output(name, sys.stdout.buffer)
+            return
+
+        # 1) Write to file. Open file and pass descriptor
         if export_file:
             with open(export_file, 'w') as f:
-                for inum in iterator:
-                    self.entries[inum].writeout_parsed(f)
+                write(f)
         # 2) To stdout. Pass sys.stdout
         else:
-            for inum in iterator:
-                self.entries[inum].writeout_parsed(sys.stdout)
+            write(sys.stdout)
 
-    def export_csv(self, inum_range=None, export_file=None):
+    def _writeout_parsed(self, out, inum_range=None, workers=None):
+        if workers and workers > 1 and not inum_range:
+            for inum, text in self._iter_parallel('parsed', workers=workers):
+                out.write(text)
+            return
+        # Entries that are asked for explicitly are written out, even if they are not valid
+        for entry in self.iter_entries(inum_range=inum_range, include_invalid=bool(inum_range)):
+            entry.writeout_parsed(out)
+
+    def export_parsed(self, inum_range=None, export_file=None, workers=None):
+        """With more than one worker, the whole $MFT is parsed and formatted by that many processes. With a cache, an
+        export of the whole $MFT is only parsed once."""
+        self._export(None if inum_range else 'mft.parsed',
+                     export_file,
+                     lambda out: self._writeout_parsed(out, inum_range=inum_range, workers=workers))
+
+    def format_csv_column_headers(self, full_path=False):
         formatted_columns = []
-        if inum_range:
-            iterator = inum_range.iterate
-        else:
-            iterator = self.entries.keys()
         # Any MFTEntry object will do, we just have easy access to MFT's own entry.
         formatted_columns.extend(self.mft.format_csv_column_headers())
+        if full_path:
+            formatted_columns.append('full path')
+        return formatted_columns
 
-        # 1) Write to file. Open file and pass descriptor
-        if export_file:
-            with open(export_file, 'w') as f:
-                csv_writer = csv.writer(f)
-                csv_writer.writerow(formatted_columns)
-                for inum in iterator:
-                    formatted = []
-                    formatted.extend(self.entries[inum].format_csv())
-                    csv_writer.writerow(formatted)
-        # 2) To stdout. Pass sys.stdout
-        else:
-            csv_writer = csv.writer(sys.stdout)
-            csv_writer.writerow(formatted_columns)
-            for inum in iterator:
-                formatted = []
-                formatted.extend(self.entries[inum].format_csv())
-                csv_writer.writerow(formatted)
+    def format_csv(self, entry, full_path=False):
+        formatted = []
+        formatted.extend(entry.format_csv())
+        if full_path:
+            formatted.append(self.full_path(entry.inum))
+        return formatted
 
-    def export_raw(self, inum_range=None, export_file=None):
+    def _csv_rows(self, inum_range=None, full_path=False, workers=None):
+        if workers and workers > 1 and not inum_range:
+            for inum, row in self._iter_parallel('csv', workers=workers):
+                if full_path:
+                    row.append(self.full_path(inum))
+                yield row
+            return
+        for entry in self.iter_entries(inum_range=inum_range, include_invalid=bool(inum_range)):
+            yield self.format_csv(entry, full_path)
+
+    def _writeout_csv(self, out, inum_range=None, full_path=False, workers=None):
+        csv_writer = csv.writer(out)
+        csv_writer.writerow(self.format_csv_column_headers(full_path))
+        csv_writer.writerows(self._csv_rows(inum_range=inum_range, full_path=full_path, workers=workers))
+
+    def export_csv(self, inum_range=None, export_file=None, full_path=False, workers=None):
+        """With full_path a column with the full path of every entry is added. That needs the names of all entries,
+        so the whole MFT is read once before the first row is written. With more than one worker, the rows of the
+        whole $MFT are made by that many processes. With a cache, an export of the whole $MFT is only parsed once."""
         if inum_range:
-            iterator = inum_range.iterate
+            name = None
         else:
-            iterator = self.entries.keys()        # 1) Write to file. Open file and pass descriptor
+            name = 'mft.full_path.csv' if full_path else 'mft.csv'
+        self._export(name,
+                     export_file,
+                     lambda out: self._writeout_csv(out, inum_range=inum_range, full_path=full_path, workers=workers))
+
+    def export_raw(self, inum_range=None, export_file=None):
+        iterator = self.iter_entries(inum_range=inum_range, include_invalid=bool(inum_range))
+        # 1) Write to file. Open file and pass descriptor
         if export_file:
             with open(export_file, 'wb') as f:
-                for inum in iterator:
-                    self.entries[inum].writeout_raw(f)
+                for entry in iterator:
+                    entry.writeout_raw(f)
         # 2) To stdout. Pass sys.stdout
         else:
-            for inum in iterator:
-                self.entries[inum].writeout_raw(sys.stdout.buffer)
+            for entry in iterator:
+                entry.writeout_raw(sys.stdout.buffer)
+
+    def name_table(self):
+        """Dictionary with the (name, parent inum, parent sequence number, sequence number) of every base entry that
+        is in use and has a $FILE_NAME attribute"""
+        if self._name_table is None:
+            self._name_table = self._cached('name_table', self._create_name_table)
+        return self._name_table
+
+    def _create_name_table(self):
+        names = {}
+        for entry in self.iter_entries(lazy=True):
+            # Deleted directories would otherwise still show up in the paths of the entries that are in them now
+            if not entry.is_in_use or not entry.is_base_entry or AttributeTypeEnum.FILE_NAME not in entry.attributes:
+                continue
+            file_names = entry.attributes[AttributeTypeEnum.FILE_NAME]
+            # Prefer the long name over the DOS 8.3 one
+            file_name = next((fn for fn in file_names if fn.namespace != FileName.NAMESPACE_DOS), file_names[0])
+            names[entry.inum] = (file_name.name,
+                                 file_name.parent_directory_file_reference_mft_entry,
+                                 file_name.parent_directory_file_reference_sequence_number,
+                                 entry.sequence_value)
+        return names
+
+    def full_path(self, inum):
+        """Full path of an entry, like \\Windows\\System32\\foo.dll. Entries whose parent directory is gone, or has
+        been reused since (its sequence number changed), are placed under ORPHAN_DIRECTORY. Returns None for entries
+        without a name and entries that are not in use."""
+        names = self.name_table()
+        if inum not in names:
+            return None
+        if inum == MFT.ROOT:
+            return '\\'
+
+        # Walk up to the first directory with a known path. Every directory on the way is remembered, so each one is
+        # only walked once for the whole MFT.
+        chain = []
+        # The same inums as chain, to find loops without searching the list
+        chain_inums = set()
+        current = inum
+        while current not in self._directory_paths:
+            chain.append(current)
+            chain_inums.add(current)
+            name, parent, parent_sequence, sequence = names[current]
+            if parent not in names or names[parent][3] != parent_sequence or parent in chain_inums:
+                path = MFT.ORPHAN_DIRECTORY
+                break
+            current = parent
+        else:
+            path = self._directory_paths[current]
+
+        for link in reversed(chain):
+            path += '\\' + names[link][0]
+            if link != inum:
+                self._directory_paths[link] = path
+        return path
+
+    def is_orphan(self, inum):
+        path = self.full_path(inum)
+        return path is not None and path.startswith(MFT.ORPHAN_DIRECTORY + '\\')
+
+    def usn_jrnl_inum(self):
+        """inum of $UsnJrnl, looked up in the index of $Extend"""
+        entry = self.entries[MFT.EXTEND] if MFT.EXTEND in self.entries else self._create_entry(MFT.EXTEND)
+        return entry.attributes[AttributeTypeEnum.INDEX_ROOT][0].\
+            entries[AttributeTypeEnum.FILE_NAME]['$UsnJrnl'].\
+            file_reference_mft_entry
+
+    def open_stream(self, inum=None, stream=0):
+        """Opens a $DATA stream of an entry as a read-only file object, see DataStream. stream is the number of the
+        $DATA attribute or its name."""
+        entry = self.entries[inum] if inum in self.entries else self._create_entry(inum)
+        data_streams = entry.attributes[AttributeTypeEnum.DATA]
+        if isinstance(stream, str):
+            stream = [attribute.header.name for attribute in data_streams].index(stream)
+        return DataStream(image_name=self.image_name,
+                          attribute=data_streams[stream],
+                          partition_offset_bytes=self.partition_offset_bytes,
+                          cluster_size=self.cluster_size)
 
     def extract_data(self, inum=None, output_file=None, stream=None):
+        if inum not in self.entries and not stream:
+            # System files can be extracted with just their runlist, without parsing the entry
+            self.extract_system_file(inum=inum, output_file=output_file)
+            return
+
         data_stream = self.entries[inum].attributes[AttributeTypeEnum.DATA][stream]
         if output_file:
             with open(self.image_name, 'rb') as in_file, open(output_file, 'wb') as out_file:
@@ -179,23 +534,49 @@ class MFT():
     def extract_resident_data(self, attr=None, out=None):
         out.write(attr.content_data)
 
-    def extract_non_resident_data(self, attr=None, in_file=None, out_file=None):
-        runs = attr.header.runlist_extended.cleaned_runs
-
-        # First the first entry, which is an absolute offset from the start of the partition
-        offset, length = runs[0]
+    def extract_system_file(self, inum=None, output_file=None):
+        runs, size = self.system_runlists()[inum]
+        if output_file:
+            with open(self.image_name, 'rb') as in_file, open(output_file, 'wb') as out_file:
+                self.extract_runs(runs=runs, size=size, in_file=in_file, out_file=out_file)
+        else:
+            with open(self.image_name, 'rb') as in_file:
+                self.extract_runs(runs=runs, size=size, in_file=in_file, out_file=sys.stdout.buffer)
 
-        in_file.seek(self.partition_offset_bytes + offset * self.cluster_size, os.SEEK_SET)
-        prev_offset = in_file.tell()
-        out_file.write(in_file.read(length * self.cluster_size))
+    def extract_non_resident_data(self, attr=None, in_file=None, out_file=None):
+        self.extract_runs(runs=attr.header.runlist_extended.runs,
+                          size=attr.header.attribute_content_actual_size,
+                          in_file=in_file,
+                          out_file=out_file)
 
-        # The following runs, if existent, are offsets based on the previous location
-        for offset, length in runs[1:]:
-            in_file.seek(prev_offset + offset * self.cluster_size, os.SEEK_SET)
-            prev_offset = in_file.tell()
-            out_file.write(in_file.read(length * self.cluster_size))
+    def extract_runs(self, runs=None, size=None, in_file=None, out_file=None):
+        """Copies the clusters of a runlist to out_file, in chunks. Stops after size bytes of the stream, so the slack
+        of the last cluster is left out. Sparse runs become holes in out_file, they are not read from the image."""
+        if size is None:
+            size = sum(run_length for run_offset, run_length in runs) * self.cluster_size
+        lcn = 0
+        stream_offset = 0
+        for run_offset, run_length in runs:
+            if stream_offset >= size:
+                break
+            length = min(run_length * self.cluster_size, size - stream_offset)
+            stream_offset += length
+            if run_offset is None:
+                skip_range(length, out_file)
+                continue
+            # The offsets in the runlist are relative to the previous run, the first one to the start of the partition
+            lcn += run_offset
+            copy_range(in_file, self.partition_offset_bytes + lcn * self.cluster_size, length, out_file)
+        # A hole at the end only counts once the file has its full size
+        if out_file.seekable():
+            out_file.truncate()
 
-    def print_statistics(self):
+    def print_statistics(self, columns=None):
+        # The columns hold the same numbers, without having parsed all entries
+        if columns is not None:
+            print('%-20s %s' % ('Maxinum inum:', str(int(columns['inum'].max()))))
+            print('%-20s %s' % ('MFT entries:', str(len(columns))))
+            return
         print('%-20s %s' % ('Maxinum inum:', str(self.max_inum())))
         print('%-20s %s' % ('MFT entries:', str(len([entry for entry in self.entries if entry is not None]))))
 
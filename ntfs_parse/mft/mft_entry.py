@@ -1,10 +1,42 @@
 from binascii import hexlify
 from collections import OrderedDict
 
-from ntfs_parse import reverse_hexlify
-from .common import _BIG_BAR, _SMALL_BAR, AttributeTypeEnum
+from collections.abc import Mapping
+
+from ntfs_parse import StructLayout, replace_fixups
+from .common import _BIG_BAR, _SMALL_BAR, AttributeTypeEnum, AttributeTypeEnumConverter
 from .factories import AttributeFactory
 from .attributes import StandardInformation, FileName
+from .attribute_headers import AttributeHeader
+
+
+ATTRIBUTE_WALK_LAYOUT = StructLayout(AttributeHeader.TYPE_RAW, AttributeHeader.ATTRIBUTE_LENGTH)
+
+
+class LazyAttributes(Mapping):
+    """Takes the place of the attributes dictionary of an MFTEntry. Only the offsets of the attributes are known
+    beforehand, the attribute objects of a type are created the first time that type is looked up."""
+
+    def __init__(self, data, attribute_offsets):
+        self.data = data
+        self._attribute_offsets = attribute_offsets
+        self._attributes = {}
+
+    def __getitem__(self, type_enum):
+        if type_enum not in self._attributes:
+            self._attributes[type_enum] = [AttributeFactory.create_attribute(self.data[offset:])
+                                           for offset in self._attribute_offsets[type_enum]]
+        return self._attributes[type_enum]
+
+    def __contains__(self, type_enum):
+        # Don't create the attributes just to check whether they're there
+        return type_enum in self._attribute_offsets
+
+    def __iter__(self):
+        return iter(self._attribute_offsets)
+
+    def __len__(self):
+        return len(self._attribute_offsets)
 
 
 class MFTEntry():
@@ -20,36 +52,75 @@ class MFTEntry():
     ALLOCATED_SIZE_OF_MFT_ENTRY = ('allocated size of MFT entry', 28, 31)
     FILE_REFERENCE_TO_BASE_RECORD = ('file reference to base record', 32, 39)
     NEXT_ATTRIBUTE_ID = ('next attribute id', 40, 41)
+    LAYOUT = StructLayout(OFFSET_TO_FIXUP_ARRAY, NUMBER_OF_ENTRIES_IN_FIXUP_ARRAY, LOGFILE_SEQUENCE_NUMBER, SEQUENCE_VALUE,
+                          LINK_COUNT, OFFSET_TO_FIRST_ATTRIBUTE, FLAGS, USED_SIZE_OF_MFT_ENTRY,
+                          ALLOCATED_SIZE_OF_MFT_ENTRY, FILE_REFERENCE_TO_BASE_RECORD, NEXT_ATTRIBUTE_ID)
 
-    def __init__(self, inum=None, image_byte_offset=None, data=None, logfile_parse=False):
+    def __init__(self, inum=None, image_byte_offset=None, data=None, logfile_parse=False, lazy=False):
         self.inum = inum
         self.image_byte_offset = image_byte_offset
-        self.data = bytearray(data)
+        self.data = data
+        self._values = MFTEntry.LAYOUT.unpack(data)
         self._is_valid = self._check_validity()
         self.attributes = OrderedDict()
         self.logfile_parse = logfile_parse
         if not self.is_valid:
             return
+        # Data may be a read-only view on the image. Only entries that are actually parsed get their own copy, as the
+        # fixup values are replaced in place.
+        self.data = bytearray(data)
         if not self.logfile_parse:
             self._replace_fixup_values()
 
+        # Walk the attribute headers, only looking at the type and the length of each attribute
+        attribute_offsets = OrderedDict()
         attribute_offset = self.first_attribute_offset
-
-        while True:
-            if self.data[attribute_offset:attribute_offset + 4] == b'\xff\xff\xff\xff':
+        while attribute_offset + ATTRIBUTE_WALK_LAYOUT.size <= len(self.data):
+            values = ATTRIBUTE_WALK_LAYOUT.unpack(self.data, attribute_offset)
+            if values[AttributeHeader.TYPE_RAW] == 0xFFFFFFFF or values[AttributeHeader.ATTRIBUTE_LENGTH] == 0:
                 break
-            attribute = AttributeFactory.create_attribute(self.data[attribute_offset:])
-            type_enum = attribute.header.enum
-            if type_enum not in self.attributes.keys():
-                self.attributes[type_enum] = []
-            self.attributes[type_enum].append(attribute)
-            attribute_offset += attribute.header.attribute_length
+            type_enum = AttributeTypeEnumConverter.from_identifier(values[AttributeHeader.TYPE_RAW])
+            if type_enum not in attribute_offsets.keys():
+                attribute_offsets[type_enum] = []
+            attribute_offsets[type_enum].append(attribute_offset)
+            attribute_offset += values[AttributeHeader.ATTRIBUTE_LENGTH]
+
+        if lazy:
+            self.attributes = LazyAttributes(self.data, attribute_offsets)
+        else:
+            for type_enum, offsets in attribute_offsets.items():
+                self.attributes[type_enum] = [AttributeFactory.create_attribute(self.data[offset:]) for offset in offsets]
+
+    def __getstate__(self):
+        # Entries that are not valid may still hold a view on the mapped image, which can't be pickled
+        state = self.__dict__.copy()
+        if isinstance(self.data, memoryview):
+            state['data'] = bytes(self.data)
+        return state
+
+    def lazy_state(self):
+        """Compact, picklable form of a lazy entry: the (fixed up) data, the header values and the offsets of the
+        attributes. from_lazy_state creates a lazy entry from it without reading the header or walking the attributes
+        again."""
+        attribute_offsets = self.attributes._attribute_offsets if isinstance(self.attributes, LazyAttributes) else None
+        return (self.inum, self.image_byte_offset, bytes(self.data), self._values, self._is_valid,
+                attribute_offsets)
+
+    @classmethod
+    def from_lazy_state(cls, state):
+        entry = cls.__new__(cls)
+        entry.inum, entry.image_byte_offset, data, entry._values, entry._is_valid, attribute_offsets = state
+        entry.logfile_parse = False
+        if entry._is_valid:
+            entry.data = bytearray(data)
+            entry.attributes = LazyAttributes(entry.data, attribute_offsets)
+        else:
+            entry.data = data
+            entry.attributes = OrderedDict()
+        return entry
 
     def _replace_fixup_values(self):
-        fixup_part = self.data[self.fixup_array_offset : self.fixup_array_offset + 2 * self.fixup_array_n_entries]
-        for e in range(1, self.fixup_array_n_entries):
-            mem_view = memoryview(self.data)
-            mem_view[e * 512 - 2 : e * 512] = fixup_part[2 * e : 2 * e + 2]
+        replace_fixups(self.data, self.fixup_array_offset, self.fixup_array_n_entries)
 
     def _check_validity(self):
         if self.signature_raw != b'\x46\x49\x4c\x45':
@@ -66,7 +137,7 @@ class MFTEntry():
 
     @property
     def signature_raw(self):
-        return self.data[0:4]
+        return bytes(self.data[0:4])
 
     @property
     def fixup_array_offset_raw(self):
@@ -121,47 +192,47 @@ class MFTEntry():
 
     @property
     def fixup_array_offset(self):
-        return int(reverse_hexlify(self.fixup_array_offset_raw), 16)
+        return self._values[MFTEntry.OFFSET_TO_FIXUP_ARRAY]
 
     @property
     def fixup_array_n_entries(self):
-        return int(reverse_hexlify(self.fixup_array_n_entries_raw), 16)
+        return self._values[MFTEntry.NUMBER_OF_ENTRIES_IN_FIXUP_ARRAY]
 
     @property
     def lsn(self):
-        return int(reverse_hexlify(self.lsn_raw), 16)
+        return self._values[MFTEntry.LOGFILE_SEQUENCE_NUMBER]
 
     @property
     def sequence_value(self):
-        return int(reverse_hexlify(self.sequence_value_raw), 16)
+        return self._values[MFTEntry.SEQUENCE_VALUE]
 
     @property
     def link_count(self):
-        return int(reverse_hexlify(self.link_count_raw), 16)
+        return self._values[MFTEntry.LINK_COUNT]
 
     @property
     def first_attribute_offset(self):
-        return int(reverse_hexlify(self.first_attribute_offset_raw), 16)
+        return self._values[MFTEntry.OFFSET_TO_FIRST_ATTRIBUTE]
 
     @property
     def flags(self):
-        return int(reverse_hexlify(self.flags_raw), 16)
+        return self._values[MFTEntry.FLAGS]
 
     @property
     def mft_entry_used_size(self):
-        return int(reverse_hexlify(self.mft_entry_used_size_raw), 16)
+        return self._values[MFTEntry.USED_SIZE_OF_MFT_ENTRY]
 
     @property
     def mft_entry_allocated_size(self):
-        return int(reverse_hexlify(self.mft_entry_allocated_size_raw), 16)
+        return self._values[MFTEntry.ALLOCATED_SIZE_OF_MFT_ENTRY]
 
     @property
     def file_reference_to_base_record(self):
-        return int(reverse_hexlify(self.file_reference_to_base_record_raw), 16)
+        return self._values[MFTEntry.FILE_REFERENCE_TO_BASE_RECORD]
 
     @property
     def next_attribute_id(self):
-        return int(reverse_hexlify(self.next_attribute_id_raw), 16)
+        return self._values[MFTEntry.NEXT_ATTRIBUTE_ID]
 
     ####################################################################################################################
     # Derived values
@@ -0,0 +1,135 @@
+########################################################################################################################
+# DataStream class
+#
+# Read-only, seekable file object on the content of an attribute. Resident content is served from memory, non resident
+# content is read from the image through the runlist of the attribute. Sparse runs and the part beyond the initialized
+# size read as zeroes, the stream ends at the actual size. Nothing is carved out to disk first.
+#
+# It is a raw stream: every read goes to the image. Wrap it in an io.BufferedReader for lots of small reads.
+########################################################################################################################
+
+from bisect import bisect_right
+import io
+
+
+class DataStream(io.RawIOBase):
+    def __init__(self, image_name=None, attribute=None, partition_offset_bytes=0, cluster_size=4096):
+        super().__init__()
+        self.image_name = image_name
+        self.partition_offset_bytes = partition_offset_bytes
+        self.cluster_size = cluster_size
+        self._position = 0
+        self._file = None
+        header = attribute.header
+        if header.is_resident:
+            self._content = bytes(attribute.content_data)
+            self._runlist = None
+            self.size = len(self._content)
+            self.initialized_size = self.size
+        else:
+            self._content = None
+            self._runlist = header.runlist_extended
+            self.size = header.attribute_content_actual_size
+            self.initialized_size = min(header.attribute_content_initialized_size, self.size)
+            self._file = open(image_name, 'rb', buffering=0)
+
+    def __getstate__(self):
+        # The image is opened again on the other side
+        state = self.__dict__.copy()
+        state['_file'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._runlist is not None:
+            self._file = open(self.image_name, 'rb', buffering=0)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('invalid whence (%r)' % whence)
+        if position < 0:
+            raise ValueError('negative seek position %d' % position)
+        self._position = position
+        return position
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+    def next_data(self, position):
+        """First offset from position on that isn't in a sparse run or beyond the initialized size. Returns the size of
+        the stream when only zeroes are left."""
+        if self._runlist is None:
+            return min(position, self.size)
+        runlist = self._runlist
+        vcn = position // self.cluster_size
+        if vcn >= runlist.vcn_count:
+            return self.size
+        run = max(bisect_right(runlist.vcn_starts, vcn) - 1, 0)
+        while run < len(runlist.lcn_starts) and runlist.lcn_starts[run] is None:
+            run += 1
+        if run == len(runlist.lcn_starts):
+            return self.size
+        position = max(position, runlist.vcn_starts[run] * self.cluster_size)
+        return self.size if position >= self.initialized_size else position
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        length = max(0, min(len(view), self.size - self._position))
+        if self._content is not None:
+            view[:length] = self._content[self._position:self._position + length]
+        else:
+            self._read_runs(view[:length])
+        self._position += length
+        return length
+
+    def _read_runs(self, view):
+        """Fills view with the content from the current position, run by run"""
+        runlist = self._runlist
+        position = self._position
+        done = 0
+        while done < len(view):
+            # Everything beyond the initialized size reads as zeroes
+            if position >= self.initialized_size:
+                view[done:] = bytes(len(view) - done)
+                return
+            vcn = position // self.cluster_size
+            if vcn >= runlist.vcn_count:
+                view[done:] = bytes(len(view) - done)
+                return
+            run = bisect_right(runlist.vcn_starts, vcn) - 1
+            run_end = (runlist.vcn_starts[run] + runlist.runs[run][runlist.RUN_LENGTH]) * self.cluster_size
+            length = min(len(view) - done, run_end - position, self.initialized_size - position)
+
+            lcn_start = runlist.lcn_starts[run]
+            if lcn_start is None:
+                # Sparse run
+                view[done:done + length] = bytes(length)
+            else:
+                offset = (self.partition_offset_bytes + lcn_start * self.cluster_size
+                          + position - runlist.vcn_starts[run] * self.cluster_size)
+                self._file.seek(offset)
+                n_bytes = self._file.readinto(view[done:done + length]) or 0
+                if n_bytes < length:
+                    # The image ends before the run does
+                    view[done + n_bytes:] = bytes(len(view) - done - n_bytes)
+                    return
+            done += length
+            position += length
@@ -0,0 +1,187 @@
+########################################################################################################################
+# Full run pipeline
+#
+# Parses the MFT, the $LogFile and the $UsnJrnl of an image in one go. The boot sector and the entry of $MFT are parsed
+# once, every artifact is parsed once, in its own stage, and each parsed record is handed to all sinks of that stage. A
+# sink writes one output file. The stages run in separate worker processes, so the whole run takes about as long as the
+# slowest stage.
+#
+#   run_pipeline(image_name='disk.raw', offset_sectors=128, directory='output')
+#
+# The output files are the same as the ones of the separate scripts.
+########################################################################################################################
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import os
+
+from ntfs_parse import MFT, BootSector, LogFile, UsnJrnl
+from ntfs_parse.usn_jrnl.usn_jrnl import UsnRecordV2
+
+
+class Sink():
+    """Writes the records of one stage to a file. start() gets the parsed artifact before the first record, finish()
+    after the last one."""
+    # Whether the sink needs the transactions of the $LogFile. Their records are kept and connected into transactions
+    # after the last one, otherwise they are handed on as they are parsed.
+    transactions = False
+
+    def __init__(self, file_name=None, full_path=False):
+        self.file_name = file_name
+        # Only used by the MFT csv, for its full path column
+        self.full_path = full_path
+        self.out = None
+
+    def start(self, source):
+        self.out = open(self.file_name, 'w')
+
+    def write(self, record):
+        pass
+
+    def finish(self, source):
+        self.out.close()
+
+
+class CSVSink(Sink):
+    def start(self, source):
+        super().start(source)
+        self.csv_writer = csv.writer(self.out)
+
+
+class MFTParsedSink(Sink):
+    def write(self, entry):
+        entry.writeout_parsed(self.out)
+
+
+class MFTCSVSink(CSVSink):
+    def start(self, mft):
+        super().start(mft)
+        self.mft = mft
+        self.csv_writer.writerow(mft.format_csv_column_headers(self.full_path))
+
+    def write(self, entry):
+        self.csv_writer.writerow(self.mft.format_csv(entry, self.full_path))
+
+
+class LogFileParsedSink(Sink):
+    def start(self, log_file):
+        super().start(log_file)
+        log_file.writeout_parsed_areas(self.out)
+
+    def write(self, rcrd):
+        rcrd.writeout_all(self.out)
+
+
+class LogFileCSVSink(CSVSink):
+    # The rows have the transaction numbers, they are written once the transactions are connected
+    transactions = True
+
+    def start(self, log_file):
+        super().start(log_file)
+        self.csv_writer.writerow(LogFile.format_csv_column_headers())
+
+    def finish(self, log_file):
+        for rcrd in log_file.rcrd_records:
+            rcrd.export_csv(self.csv_writer)
+        super().finish(log_file)
+
+
+class LogFileTransactionSink(CSVSink):
+    transactions = True
+
+    def finish(self, log_file):
+        log_file.writeout_transactions(self.csv_writer)
+        super().finish(log_file)
+
+
+class UsnCSVSink(CSVSink):
+    def start(self, usn_jrnl):
+        super().start(usn_jrnl)
+        # Only version 2 records are parsed
+        self.csv_writer.writerow(UsnRecordV2.formatted_csv_column_headers())
+
+    def write(self, record):
+        self.csv_writer.writerow(record.formatted_csv())
+
+
+# Every output the pipeline can make, by name: (stage, sink class, file name)
+SINKS = {
+    'mft.parsed': ('mft', MFTParsedSink, 'mft.parsed'),
+    'mft.csv': ('mft', MFTCSVSink, 'mft.csv'),
+    'logfile.parsed': ('logfile', LogFileParsedSink, 'logfile.parsed'),
+    'logfile.csv': ('logfile', LogFileCSVSink, 'logfile.csv'),
+    'logfile.transactions': ('logfile', LogFileTransactionSink, 'logfile_transactions.csv'),
+    'usnjrnl.csv': ('usnjrnl', UsnCSVSink, 'usnjrnl.csv'),
+}
+
+
+def _parse_mft(mft, dump_dir, sinks):
+    return mft, mft.iter_entries()
+
+
+def _iter_logfile_pages(log_file, transactions):
+    """The pages of the $LogFile, as they are parsed. With transactions they are kept, and connected into transactions
+    after the last one."""
+    yield from log_file.iter_pages(keep=transactions)
+    if transactions:
+        log_file.connect_transactions()
+
+
+def _parse_logfile(mft, dump_dir, sinks):
+    log_file = LogFile.from_image(mft=mft, dump_dir=dump_dir)
+    log_file.parse_areas()
+    return log_file, _iter_logfile_pages(log_file, any(sink.transactions for sink in sinks))
+
+
+def _parse_usnjrnl(mft, dump_dir, sinks):
+    usn_jrnl = UsnJrnl.from_image(mft=mft)
+    usn_jrnl.parse()
+    return usn_jrnl, usn_jrnl.records
+
+
+_STAGES = {
+    'mft': _parse_mft,
+    'logfile': _parse_logfile,
+    'usnjrnl': _parse_usnjrnl,
+}
+
+
+def run_stage(stage, mft, dump_dir, sinks):
+    """Parses the artifact of one stage and hands every record to all of its sinks"""
+    source, records = _STAGES[stage](mft, dump_dir, sinks)
+    for sink in sinks:
+        sink.start(source)
+    for record in records:
+        for sink in sinks:
+            sink.write(record)
+    for sink in sinks:
+        sink.finish(source)
+    mft.close()
+    return stage
+
+
+def run_pipeline(image_name=None, offset_sectors=None, offset_bytes=None, sector_size=512, directory='.',
+                 sinks=tuple(SINKS), workers=3, dump_dir='errorpages', full_path=False):
+    """Runs the stages that have one of the named sinks. With more than one worker each stage gets a process of its
+    own. full_path adds the full path column to the MFT csv."""
+    os.makedirs(directory, exist_ok=True)
+
+    stage_sinks = {}
+    for name in sinks:
+        stage, sink_class, file_name = SINKS[name]
+        stage_sinks.setdefault(stage, []).append(sink_class(os.path.join(directory, file_name), full_path))
+
+    # Every stage finds its artifact through the MFT, which only needs the boot sector and the runlist of $MFT
+    sector = BootSector(image_name=image_name, offset_sectors=offset_sectors, offset_bytes=offset_bytes,
+                        sector_size=sector_size)
+    mft = MFT(image_name=image_name, boot_sector=sector)
+    mft.mft_runlist()
+
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_stage, stage, mft, dump_dir, stage_sinks[stage])
+                       for stage in _STAGES if stage in stage_sinks]
+            # Raises the first error that happened in a stage
+            return [future.result() for future in futures]
+    return [run_stage(stage, mft, dump_dir, stage_sinks[stage])
+            for stage in _STAGES if stage in stage_sinks]
@@ -1 +1,2 @@
-from .usn_jrnl import UsnJrnl, UsnRecord
+from .usn_jrnl import UsnJrnl, UsnRecord, UsnMax
+from .checkpoint import UsnCheckpoint
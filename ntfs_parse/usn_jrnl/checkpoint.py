@@ -0,0 +1,54 @@
+########################################################################################################################
+# UsnCheckpoint class
+#
+# Remembers where an earlier parse of a UsnJrnl stopped: the USN and byte offset of the last record and the journal ID
+# from $Max. A later parse of the same journal continues right after that record, so only new records are parsed:
+#
+#   checkpoint = UsnCheckpoint.load('usnjrnl.checkpoint')
+#   usn_jrnl.parse(checkpoint=checkpoint)
+#   usn_jrnl.checkpoint(previous=checkpoint).save('usnjrnl.checkpoint')
+#
+# The file is a small JSON document.
+########################################################################################################################
+
+import json
+import os
+
+
+class UsnCheckpoint():
+    def __init__(self, journal_id=None, usn=None, offset_bytes=None, record_length=None):
+        self.journal_id = journal_id
+        self.usn = usn
+        self.offset_bytes = offset_bytes
+        self.record_length = record_length
+
+    @classmethod
+    def from_record(cls, record, journal_id=None):
+        return cls(journal_id=journal_id, usn=record.usn, offset_bytes=record.offset_bytes,
+                   record_length=record.record_length)
+
+    @classmethod
+    def load(cls, file_name):
+        """Reads a checkpoint, None when there is none (or it can't be read)"""
+        try:
+            with open(file_name) as f:
+                values = json.load(f)
+            return cls(journal_id=values['journal id'], usn=values['usn'], offset_bytes=values['offset bytes'],
+                       record_length=values['record length'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, file_name):
+        # Write to a temporary file first, so an interrupted run keeps the old checkpoint
+        temp_name = '%s.%d.tmp' % (file_name, os.getpid())
+        with open(temp_name, 'w') as f:
+            json.dump({'journal id': self.journal_id,
+                       'usn': self.usn,
+                       'offset bytes': self.offset_bytes,
+                       'record length': self.record_length}, f, indent=4)
+        os.replace(temp_name, file_name)
+
+    @property
+    def next_offset_bytes(self):
+        """Where the record after the checkpoint starts"""
+        return self.offset_bytes + self.record_length
@@ -0,0 +1,169 @@
+########################################################################################################################
+# UsnRecordStore class
+#
+# Keeps USN records on disk instead of in a list, for journals with more records than fit in memory. Every record is a
+# row of fixed width columns in one file, the names are stored one after the other in a second file and found through
+# a start offset in the row. The parser fills it a batch at a time, reading goes through memory maps:
+#
+#   store = UsnRecordStore('work')
+#   usn_jrnl = UsnJrnl(file='usnjrnl.raw', store=store)
+#   usn_jrnl.parse()
+#   mask = store['reason'] & 0x200 != 0
+#   for mft_entry, sequence_number, records in store.iter_grouped_by_entry():
+#       ...
+#
+# It stands in for the records list, indexing and iterating give UsnRecordV2 objects that are created when asked for.
+# Only version 2 records are kept, the others aren't parsed anyway. NumPy is only needed when this module is imported.
+########################################################################################################################
+
+import os
+
+import numpy
+
+from .usn_jrnl import UsnRecordV2
+
+
+RECORD_DTYPE = numpy.dtype([
+    ('offset_bytes', '<u8'),
+    ('record_length', '<u4'),
+    ('major_version', '<u2'),
+    ('minor_version', '<u2'),
+    ('file_reference_number', '<u8'),
+    ('parent_file_reference_number', '<u8'),
+    ('usn', '<u8'),
+    ('timestamp', '<u8'),
+    ('reason', '<u4'),
+    ('source_info', '<u4'),
+    ('security_id', '<u4'),
+    ('file_attributes', '<u4'),
+    ('file_name_length', '<u2'),
+    ('file_name_offset', '<u2'),
+    ('name_start', '<u8'),
+])
+
+
+class UsnRecordStore():
+    # Number of records that are kept in memory before they are written out, and read at once when iterating
+    BATCH_SIZE = 65536
+    RECORDS_FILE = 'usn_records.bin'
+    NAMES_FILE = 'usn_names.bin'
+
+    def __init__(self, directory=None, create=True):
+        """Stores the records in directory. With create, records from earlier runs are removed, otherwise they are
+        kept and new ones are added after them."""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        mode = 'wb' if create else 'ab'
+        self._records_file = open(os.path.join(directory, UsnRecordStore.RECORDS_FILE), mode)
+        self._names_file = open(os.path.join(directory, UsnRecordStore.NAMES_FILE), mode)
+        self._count = self._records_file.tell() // RECORD_DTYPE.itemsize
+        self._names_size = self._names_file.tell()
+        self._batch = []
+        self._batch_names = bytearray()
+        self._table = None
+        self._names = None
+
+    def append(self, record):
+        name = record.file_name.encode('utf-16-le')
+        self._batch.append((record.offset_bytes,) + record.values + (self._names_size + len(self._batch_names),))
+        self._batch_names += name
+        if len(self._batch) >= UsnRecordStore.BATCH_SIZE:
+            self.flush()
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def flush(self):
+        """Writes out the records that are still in memory"""
+        if self._batch:
+            numpy.array(self._batch, dtype=RECORD_DTYPE).tofile(self._records_file)
+            self._names_file.write(self._batch_names)
+            self._count += len(self._batch)
+            self._names_size += len(self._batch_names)
+            self._batch = []
+            self._batch_names = bytearray()
+        self._records_file.flush()
+        self._names_file.flush()
+        # The maps have to be made again to see the new records
+        self._table = None
+        self._names = None
+
+    def close(self):
+        self.flush()
+        self._records_file.close()
+        self._names_file.close()
+
+    @property
+    def table(self):
+        """All records as a read-only NumPy structured array, mapped from disk"""
+        if self._batch:
+            self.flush()
+        if self._table is None:
+            if self._count:
+                self._table = numpy.memmap(os.path.join(self.directory, UsnRecordStore.RECORDS_FILE),
+                                           dtype=RECORD_DTYPE, mode='r', shape=(self._count,))
+            else:
+                self._table = numpy.zeros(0, dtype=RECORD_DTYPE)
+        return self._table
+
+    @property
+    def names(self):
+        """All names, UTF-16 encoded, as a read-only array of bytes mapped from disk"""
+        if self._batch:
+            self.flush()
+        if self._names is None:
+            if self._names_size:
+                self._names = numpy.memmap(os.path.join(self.directory, UsnRecordStore.NAMES_FILE),
+                                           dtype=numpy.uint8, mode='r', shape=(self._names_size,))
+            else:
+                self._names = numpy.zeros(0, dtype=numpy.uint8)
+        return self._names
+
+    def __len__(self):
+        return self._count + len(self._batch)
+
+    def __getitem__(self, index):
+        """A column by name, a record by row number, or a list of records for a slice"""
+        if isinstance(index, str):
+            return self.table[index]
+        if isinstance(index, slice):
+            return self._records(self.table[index])
+        return self._records(self.table[index:index + 1 if index != -1 else None])[0]
+
+    def __iter__(self):
+        table = self.table
+        for start in range(0, len(table), UsnRecordStore.BATCH_SIZE):
+            yield from self._records(table[start:start + UsnRecordStore.BATCH_SIZE])
+
+    def _records(self, rows):
+        names = self.names
+        records = []
+        for row in rows.tolist():
+            name_start = row[-1]
+            name = names[name_start:name_start + row[-3]].tobytes().decode('utf-16-le', 'replace')
+            records.append(UsnRecordV2.from_values(row[1:-1], name, row[0]))
+        return records
+
+    def select(self, mask):
+        """The records of the rows in mask, one batch at a time"""
+        rows = numpy.flatnonzero(mask)
+        for start in range(0, len(rows), UsnRecordStore.BATCH_SIZE):
+            yield from self._records(self.table[rows[start:start + UsnRecordStore.BATCH_SIZE]])
+
+    def iter_grouped_by_entry(self):
+        """Yields (mft entry, sequence number, records) per file the records are about, ordered by mft entry and
+        sequence number. The records of a file keep the order of the journal, only one file is in memory at a time."""
+        references = self.table['file_reference_number']
+        if len(references) == 0:
+            return
+        # Sort on the mft entry first and the sequence number second
+        keys = ((references & 0xffffffffffff) << numpy.uint64(16)) | (references >> numpy.uint64(48))
+        order = numpy.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        bounds = numpy.flatnonzero(numpy.diff(sorted_keys)) + 1
+        starts = [0] + bounds.tolist()
+        ends = bounds.tolist() + [len(sorted_keys)]
+        for start, end in zip(starts, ends):
+            key = int(sorted_keys[start])
+            yield key >> 16, key & 0xffff, self._records(self.table[order[start:end]])
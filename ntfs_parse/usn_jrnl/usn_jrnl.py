@@ -3,64 +3,290 @@
 #
 ########################################################################################################################
 
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import csv
+import errno
 from binascii import hexlify
+import io
 import os
+import struct
 import sys
 
-from ntfs_parse import reverse, reverse_hexlify, reverse_hexlify_int, filetime_to_datetime
+from ntfs_parse import reverse_hexlify_int, filetime_int_to_datetime, StructLayout
 from ntfs_parse import FileAttributesFlag
+from .checkpoint import UsnCheckpoint
+
+
+def _parse_usn_chunk(file_name, stream, start, end):
+    """Worker for the parallel parse. Returns the records from the first plausible one after start up to end, and
+    where the next record starts."""
+    usn_jrnl = UsnJrnl(file=file_name, stream=stream)
+    with usn_jrnl._open() as f:
+        pos = usn_jrnl._resync(f, start, end)
+        next_pos = None if pos is None else usn_jrnl._parse_records(f, pos, end)
+    return usn_jrnl.records, next_pos
 
 
 class UsnJrnl():
-    def __init__(self, file):
+    # Read buffer for a stream, the records are read a few bytes at a time
+    BUFFER_SIZE = 1024 * 1024
+    # Zeroes are skipped in blocks of this size
+    SCAN_SIZE = 1024 * 1024
+    # Records start on an 8 byte boundary
+    ALIGNMENT = 8
+    # Number of bytes a worker parses at once in the parallel parse
+    CHUNK_SIZE = 64 * 1024 * 1024
+    # Upper limit for the record length when looking for the first record of a chunk
+    MAX_RECORD_LENGTH = 4096
+    # Offset of the file name length and offset fields per major version (4 has no name)
+    NAME_FIELDS = {2: 56, 3: 72, 4: None}
+
+    def __init__(self, file=None, stream=None, store=None, usn_max=None):
         self.file_name = file
-        self.records = []
-
-    def parse(self, number=None):
+        # A file object to read from instead of file, like a DataStream on the image
+        self.stream = stream
+        # The records go in a list, or in a UsnRecordStore on disk when one is given
+        self.records = [] if store is None else store
+        # UsnMax of the journal, for checkpoints
+        self.usn_max = usn_max
+        # Whether the last parse continued from a checkpoint
+        self.resumed = False
+        self._data_ranges = None
+
+    @classmethod
+    def from_image(cls, image_name=None, boot_sector=None, mft=None, store=None):
+        """Creates a UsnJrnl that reads $UsnJrnl:$J straight from the image. $UsnJrnl is looked up in $Extend. Takes
+        either an MFT object or the BootSector to create one with."""
+        from ntfs_parse.mft import MFT
+        if mft is None:
+            mft = MFT(image_name=image_name, boot_sector=boot_sector)
+        inum = mft.usn_jrnl_inum()
+        try:
+            with mft.open_stream(inum=inum, stream='$Max') as max_stream:
+                usn_max = UsnMax(max_stream.read())
+        except ValueError:
+            # No $Max stream
+            usn_max = None
+        return cls(stream=mft.open_stream(inum=inum, stream='$J'), store=store, usn_max=usn_max)
+
+    @contextmanager
+    def _open(self):
+        if self.stream is None:
+            with open(self.file_name, 'rb') as f:
+                self._data_ranges = UsnJrnl._file_data_ranges(f)
+                yield f
+        else:
+            self.stream.seek(0)
+            f = io.BufferedReader(self.stream, UsnJrnl.BUFFER_SIZE)
+            try:
+                yield f
+            finally:
+                # The stream belongs to the caller, detaching keeps it open
+                f.detach()
+
+    @staticmethod
+    def _file_data_ranges(f):
+        """(start, end) of the parts of a file that aren't holes, or None when the file system can't tell. An extracted
+        $J keeps its sparse runs as holes."""
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        ranges = []
+        position = 0
+        try:
+            while position < size:
+                start = os.lseek(fd, position, os.SEEK_DATA)
+                position = os.lseek(fd, start, os.SEEK_HOLE)
+                ranges.append((start, position))
+        except OSError as e:
+            if e.errno != errno.ENXIO:
+                return None
+        except AttributeError:
+            # No SEEK_DATA on this platform
+            return None
+        finally:
+            os.lseek(fd, 0, os.SEEK_SET)
+        # A hole at the end runs up to the end of the file
+        ranges.append((size, size))
+        return ranges
+
+    def _next_data(self, pos):
+        """First offset from pos on that isn't sparse"""
+        if self.stream is not None:
+            return self.stream.next_data(pos)
+        if self._data_ranges is None:
+            return pos
+        for start, end in self._data_ranges:
+            if pos < end:
+                return max(pos, start)
+        # Only a hole is left, the last range marks the end of the file
+        return max(pos, self._data_ranges[-1][1])
+
+    def _skip_zeroes(self, f, pos):
+        """Offset of the first record boundary after pos that isn't zero, None when only zeroes are left. Sparse parts
+        are jumped over, allocated ones are scanned a block at a time."""
+        pos = pos - pos % UsnJrnl.ALIGNMENT + UsnJrnl.ALIGNMENT
+        while True:
+            pos = self._next_data(pos)
+            f.seek(pos)
+            block = f.read(UsnJrnl.SCAN_SIZE)
+            if len(block) == 0:
+                # EOF
+                return None
+            rest = block.lstrip(b'\x00')
+            if rest:
+                pos += len(block) - len(rest)
+                return pos - pos % UsnJrnl.ALIGNMENT
+            pos += len(block)
+
+    @staticmethod
+    def _is_plausible(data, offset):
+        """Whether a record could start at offset: a sane length and version, and a name that fits in the record"""
+        if len(data) - offset < 8:
+            return False
+        record_length, major_version = struct.unpack_from('<IH', data, offset)
+        if record_length % UsnJrnl.ALIGNMENT or not 0 < record_length <= UsnJrnl.MAX_RECORD_LENGTH:
+            return False
+        if major_version not in UsnJrnl.NAME_FIELDS:
+            return False
+        if major_version == 4:
+            # Version 4 records have no name
+            return True
+        name_fields = UsnJrnl.NAME_FIELDS[major_version]
+        if len(data) - offset < name_fields + 4:
+            return False
+        name_length, name_offset = struct.unpack_from('<HH', data, offset + name_fields)
+        return name_offset == name_fields + 4 and name_offset + name_length <= record_length
+
+    def _resync(self, f, pos, end):
+        """Offset of the first plausible record from pos on that starts before end, None if there is none"""
+        pos += -pos % UsnJrnl.ALIGNMENT
+        while pos < end:
+            pos = self._next_data(pos)
+            if pos >= end:
+                break
+            f.seek(pos)
+            # A bit more than a block, for the fields of a record that starts at the end of it
+            block = f.read(UsnJrnl.SCAN_SIZE + UsnJrnl.MAX_RECORD_LENGTH)
+            if len(block) == 0:
+                break
+            first = len(block) - len(block.lstrip(b'\x00'))
+            for offset in range(first - first % UsnJrnl.ALIGNMENT, min(len(block), UsnJrnl.SCAN_SIZE, end - pos),
+                                UsnJrnl.ALIGNMENT):
+                if UsnJrnl._is_plausible(block, offset):
+                    return pos + offset
+            pos += UsnJrnl.SCAN_SIZE
+        return None
+
+    def _parse_records(self, f, pos, end=None, number=None):
+        """Parses records from pos on until one would start at end. Returns where the next record starts, None when
+        the end of the journal or a record that can't be parsed is reached."""
         n_parsed = 0
-        with open(self.file_name, 'rb') as f:
-            while n_parsed != number:
-                pos = f.tell()
-
-                bytes = f.read(4)
-                if len(bytes) == 0:
-                    # EOF
+        while n_parsed != number:
+            if end is not None and pos >= end:
+                break
+            f.seek(pos)
+            bytes = f.read(4)
+            if len(bytes) == 0:
+                # EOF
+                return None
+            size = reverse_hexlify_int(bytes)
+            if size == 0:
+                # We've hit a bunch of zeroes, skip to where the next record starts.
+                # The file often contains blobs of zeroes as it consists of multiple runs, each padded with zeroes
+                # in the end if a full USN record doesn't fit anymore.
+                pos = self._skip_zeroes(f, pos)
+                if pos is None:
+                    return None
+                continue
+
+            f.seek(pos)
+            record = UsnRecord(f.read(size), offset_bytes=pos)
+            if not record:
+                # Record could not be parsed. At this moment, this is a weak promise that stuff will work.
+                # If this happens, just stop. Probably this is the end of the file where we will find gibberish
+                return None
+            self.records.append(record)
+            n_parsed += 1
+            pos += size
+        return pos
+
+    def _chunks(self, size, start):
+        """(start, end) of the chunks the allocated part of the journal from start on is split into, on record
+        boundaries"""
+        chunks = []
+        pos = start
+        while pos < size:
+            chunk_end = min(pos - pos % UsnJrnl.ALIGNMENT + UsnJrnl.CHUNK_SIZE, size)
+            chunks.append((pos, chunk_end))
+            pos = self._next_data(chunk_end)
+        return chunks
+
+    def _parse_parallel(self, f, start, workers):
+        size = self.stream.size if self.stream is not None else os.fstat(f.fileno()).st_size
+        chunks = self._chunks(size, start)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_parse_usn_chunk,
+                                   [self.file_name] * len(chunks),
+                                   [self.stream] * len(chunks),
+                                   [chunk_start for chunk_start, _ in chunks],
+                                   [chunk_end for _, chunk_end in chunks])
+            # Stitch the chunks together. pos is where the next record starts when parsing from the beginning.
+            # A chunk only counts from that record on, earlier ones belong to a record that started in the chunk
+            # before it, or were resynced on by mistake. When pos isn't one of the records of a chunk, the chunk is
+            # parsed again from pos.
+            pos = start
+            for (chunk_start, chunk_end), (records, next_pos) in zip(chunks, results):
+                if pos is None:
                     break
-                size = reverse_hexlify_int(bytes)
-                if size == 0:
-                    # We've hit a bunch of zeroes. Complete this useless line en start looping.
-                    # The file often contains blobs of zeroes as it consists of multiple runs, each padded with zeroes
-                    # in the end if a full USN record doesn't fit anymore.
-                    pos = f.tell()
-                    if pos % 16 != 0:
-                        f.seek(16 - pos % 16, os.SEEK_CUR)
-                    while True:
-                        line = f.read(16)
-                        if len(line) == 0:
-                            # EOF
-                            # print('breaking')
-                            return
-                        if line != b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00':
-                            break
-
-                    # Done skipping rows of zeroes.
-                    size = reverse_hexlify_int(line[0:4])
-
-                    # Reset from reading the last line
-                    f.seek(-16, os.SEEK_CUR)
-                    pos = f.tell()
-
+                if pos >= chunk_end:
+                    # Skipped over as zeroes by the chunk before
+                    continue
+                indices = {record.offset_bytes: index for index, record in enumerate(records)}
+                if pos in indices:
+                    self.records.extend(records[indices[pos]:])
+                    pos = next_pos
                 else:
-                    # This flow needs to reset its cursor.
-                    f.seek(pos)
-                record = UsnRecord(f.read(size), offset_bytes=pos)
-                if not record:
-                    # Record could not be parsed. At this moment, this is a weak promise that stuff will work.
-                    # If this happens, just stop. Probably this is the end of the file where we will find gibberish
-                    return
-                self.records.append(record)
-                n_parsed += 1
+                    pos = self._parse_records(f, pos, chunk_end)
+
+    def _resume_position(self, f, checkpoint):
+        """Where the record after checkpoint starts, None when the checkpoint doesn't hold anymore: it is of another
+        journal, or its record has been purged or overwritten."""
+        if checkpoint is None:
+            return None
+        if self.usn_max is not None:
+            if checkpoint.journal_id is not None and checkpoint.journal_id != self.usn_max.usn_journal_id:
+                return None
+            if checkpoint.usn < self.usn_max.lowest_valid_usn:
+                return None
+        f.seek(checkpoint.offset_bytes)
+        data = f.read(checkpoint.record_length)
+        if len(data) < checkpoint.record_length:
+            return None
+        record = UsnRecord(data, offset_bytes=checkpoint.offset_bytes)
+        if not record or record.usn != checkpoint.usn or record.record_length != checkpoint.record_length:
+            return None
+        return checkpoint.next_offset_bytes
+
+    def parse(self, number=None, workers=None, checkpoint=None):
+        """Parses the records of the journal. With more than one worker the allocated part is split into chunks that
+        are parsed in that many processes, giving the same records as parsing it in one go. With a UsnCheckpoint only
+        the records after it are parsed, unless it doesn't hold for this journal anymore, then all are."""
+        with self._open() as f:
+            start = self._resume_position(f, checkpoint)
+            self.resumed = start is not None
+            start = self._next_data(start or 0)
+            if workers and workers > 1 and number is None:
+                self._parse_parallel(f, start, workers)
+            else:
+                self._parse_records(f, start, number=number)
+
+    def checkpoint(self, previous=None):
+        """UsnCheckpoint after the last parsed record, previous when no records were parsed"""
+        if len(self.records) == 0:
+            return previous
+        return UsnCheckpoint.from_record(self.records[-1],
+                                         journal_id=self.usn_max.usn_journal_id if self.usn_max else None)
 
     def print_all(self):
         for record in self.records[0:10]:
@@ -69,22 +295,24 @@ class UsnJrnl():
     def print_statistics(self):
         print('count:', len(self.records))
 
-    def export_csv(self, output_file=None):
-        if len(self.records) == 0:
+    def export_csv(self, output_file=None, header=False):
+        """Nothing is written when there are no records, unless header is set. Then there is always a file with the
+        column headers, so a run that found no new records can be told apart from one that failed."""
+        if len(self.records) == 0 and not header:
             return
-        first = self.records[0]
+        # Only version 2 records are parsed
+        column_headers = self.records[0].formatted_csv_column_headers() if len(self.records) \
+            else UsnRecordV2.formatted_csv_column_headers()
         if output_file:
             with open(output_file, 'w') as f:
                 csv_writer = csv.writer(f)
-                csv_writer.writerow(first.formatted_csv_column_headers())
-                for index in range(len(self.records)):
-                    record = self.records[index]
+                csv_writer.writerow(column_headers)
+                for record in self.records:
                     csv_writer.writerow(record.formatted_csv())
         else:
             csv_writer = csv.writer(sys.stdout)
-            csv_writer.writerow(first.formatted_csv_column_headers())
-            for index in range(len(self.records)):
-                record = self.records[index]
+            csv_writer.writerow(column_headers)
+            for record in self.records:
                 csv_writer.writerow(record.formatted_csv())
 
     @property
@@ -99,6 +327,37 @@ class UsnJrnl():
         return result
 
 
+class UsnMax():
+    """Content of the $Max stream of $UsnJrnl"""
+    MAXIMUM_SIZE = ('maximum size', 0, 7)
+    ALLOCATION_DELTA = ('allocation delta', 8, 15)
+    USN_JOURNAL_ID = ('usn journal id', 16, 23)
+    LOWEST_VALID_USN = ('lowest valid usn', 24, 31)
+    LAYOUT = StructLayout(MAXIMUM_SIZE, ALLOCATION_DELTA, USN_JOURNAL_ID, LOWEST_VALID_USN)
+
+    def __init__(self, data=None):
+        self._values = UsnMax.LAYOUT.unpack(data)
+
+    ####################################################################################################################
+    # Interpreted values
+
+    @property
+    def maximum_size(self):
+        return self._values[UsnMax.MAXIMUM_SIZE]
+
+    @property
+    def allocation_delta(self):
+        return self._values[UsnMax.ALLOCATION_DELTA]
+
+    @property
+    def usn_journal_id(self):
+        return self._values[UsnMax.USN_JOURNAL_ID]
+
+    @property
+    def lowest_valid_usn(self):
+        return self._values[UsnMax.LOWEST_VALID_USN]
+
+
 class UsnRecord():
     def __new__(cls, data, offset_bytes):
         major_version = reverse_hexlify_int(data[4:6])
@@ -167,77 +426,105 @@ class UsnRecordBase():
     USN_SOURCE_AUXILARY_DATA = 0x00000002
     USN_SOURCE_REPLICATION_MANAGEMENT = 0x00000004
 
+    # Records are decoded once, only the values and the name are kept
+    __slots__ = ('offset_bytes', 'record_length', 'major_version', 'minor_version', '_file_reference_number',
+                 '_parent_file_reference_number', 'usn', 'timestamp', 'reason', 'source_info', 'security_id',
+                 'file_attributes', 'file_name_length', 'file_name_offset', 'file_name', '_timestamp_datetime')
+
     def __init__(self, data=None, offset_bytes=None):
-        record_length = reverse_hexlify_int(data[0:4])
-        self.data = data[0:record_length]
+        self._set_values(self.LAYOUT.unpack(data), offset_bytes)
+        self.file_name = bytes(data[self.file_name_offset:self.file_name_offset + self.file_name_length]).\
+            decode('utf-16', 'replace')
+
+    @classmethod
+    def from_values(cls, values, file_name, offset_bytes):
+        """Creates a record from values in the order of its LAYOUT, like the ones kept in a UsnRecordStore"""
+        record = cls.__new__(cls)
+        record._set_values(values, offset_bytes)
+        record.file_name = file_name
+        return record
+
+    def _set_values(self, values, offset_bytes):
         self.offset_bytes = offset_bytes
-        self.file_attributes_object = FileAttributesFlag(self.file_attributes)
+        (self.record_length, self.major_version, self.minor_version, self._file_reference_number,
+         self._parent_file_reference_number, self.usn, self.timestamp, self.reason, self.source_info, self.security_id,
+         self.file_attributes, self.file_name_length, self.file_name_offset) = values
+
+    @property
+    def values(self):
+        """The decoded values in the order of LAYOUT"""
+        return (self.record_length, self.major_version, self.minor_version, self._file_reference_number,
+                self._parent_file_reference_number, self.usn, self.timestamp, self.reason, self.source_info,
+                self.security_id, self.file_attributes, self.file_name_length, self.file_name_offset)
+
+    @staticmethod
+    def _pack(field, value):
+        """The bytes a decoded value was read from"""
+        description, low, high = field
+        return value if isinstance(value, bytes) else value.to_bytes(high - low + 1, 'little')
 
     ####################################################################################################################
     # Raw values
 
     @property
     def record_length_raw(self):
-        return self.data[0:4]
+        return self._pack(UsnRecordBase.RECORD_LENGTH, self.record_length)
 
     @property
     def major_version_raw(self):
-        return self.data[4:6]
+        return self._pack(UsnRecordBase.MAJOR_VERSION, self.major_version)
 
     @property
     def minor_version_raw(self):
-        return self.data[6:8]
+        return self._pack(UsnRecordBase.MINOR_VERSION, self.minor_version)
 
-    # Placeholders to be overridden by subclasses.
     @property
-    def file_reference_number_raw(self): raise NotImplementedError()
+    def file_reference_number_raw(self):
+        return self._pack(self.FILE_REFERENCE_NUMBER, self._file_reference_number)
 
     @property
-    def parent_file_reference_number_raw(self): raise NotImplementedError()
+    def parent_file_reference_number_raw(self):
+        return self._pack(self.PARENT_FILE_REFERENCE_NUMBER, self._parent_file_reference_number)
 
     @property
-    def usn_raw(self): raise NotImplementedError()
+    def usn_raw(self):
+        return self._pack(self.USN, self.usn)
 
     @property
-    def timestamp_raw(self): raise NotImplementedError()
+    def timestamp_raw(self):
+        return self._pack(self.TIMESTAMP, self.timestamp)
 
     @property
-    def reason_raw(self): raise NotImplementedError()
+    def reason_raw(self):
+        return self._pack(self.REASON, self.reason)
 
     @property
-    def source_info_raw(self): raise NotImplementedError()
+    def source_info_raw(self):
+        return self._pack(self.SOURCE_INFO, self.source_info)
 
     @property
-    def security_id_raw(self): raise NotImplementedError()
+    def security_id_raw(self):
+        return self._pack(self.SECURITY_ID, self.security_id)
 
     @property
-    def file_attributes_raw(self): raise NotImplementedError()
+    def file_attributes_raw(self):
+        return self._pack(self.FILE_ATTRIBUTES, self.file_attributes)
 
     @property
-    def file_name_length_raw(self): raise NotImplementedError()
+    def file_name_length_raw(self):
+        return self._pack(self.FILE_NAME_LENGTH, self.file_name_length)
 
     @property
-    def file_name_offset_raw(self): raise NotImplementedError()
+    def file_name_offset_raw(self):
+        return self._pack(self.FILE_NAME_OFFSET, self.file_name_offset)
 
     @property
     def file_name_raw(self):
-        return self.data[self.file_name_offset : self.file_name_offset + self.file_name_length]
+        return self.file_name.encode('utf-16-le')
 
     ####################################################################################################################
     # Interpreted values
 
-    @property
-    def record_length(self):
-        return reverse_hexlify_int(self.record_length_raw)
-
-    @property
-    def major_version(self):
-        return reverse_hexlify_int(self.major_version_raw)
-
-    @property
-    def minor_version(self):
-        return reverse_hexlify_int(self.minor_version_raw)
-
     @property
     def file_reference_number(self):
         return hexlify(self.file_reference_number_raw)
@@ -246,49 +533,13 @@ class UsnRecordBase():
     def parent_file_reference_number(self):
         return hexlify(self.parent_file_reference_number_raw)
 
-    @property
-    def usn(self):
-        return reverse_hexlify_int(self.usn_raw)
-
-    @property
-    def timestamp(self):
-        return reverse_hexlify_int(self.timestamp_raw)
-
-    @property
-    def reason(self):
-        return reverse_hexlify_int(self.reason_raw)
-
-    @property
-    def source_info(self):
-        return reverse_hexlify_int(self.source_info_raw)
-
-    @property
-    def security_id(self):
-        return reverse_hexlify_int(self.security_id_raw)
-
-    @property
-    def file_attributes(self):
-        return reverse_hexlify_int(self.file_attributes_raw)
-
-    @property
-    def file_name_length(self):
-        return reverse_hexlify_int(self.file_name_length_raw)
-
-    @property
-    def file_name_offset(self):
-        return reverse_hexlify_int(self.file_name_offset_raw)
-
-    @property
-    def file_name(self):
-        return self.file_name_raw.decode('utf-16')
-
     ####################################################################################################################
     # Derived values
 
     @property
     def timestamp_datetime(self):
         if not hasattr(self, '_timestamp_datetime'):
-            self._timestamp_datetime = filetime_to_datetime(self.timestamp_raw)
+            self._timestamp_datetime = filetime_int_to_datetime(self.timestamp)
         return self._timestamp_datetime
 
     @property
@@ -303,6 +554,10 @@ class UsnRecordBase():
     def usn_source_replication_management_flag_set(self):
         return bool(self.source_info & UsnRecordV2.USN_SOURCE_REPLICATION_MANAGEMENT)
 
+    @property
+    def file_attributes_object(self):
+        return FileAttributesFlag(self.file_attributes)
+
     @property
     def file_attributes_string(self):
         return '|'.join(self.file_attributes_object.reason_list())
@@ -342,7 +597,8 @@ class UsnRecordBase():
             self.file_name
         ]
 
-    def formatted_csv_column_headers(self):
+    @classmethod
+    def formatted_csv_column_headers(cls):
         formatted = [
             'record length',
             'major version',
@@ -397,58 +653,11 @@ class UsnRecordV2(UsnRecordBase):
     FILE_NAME_LENGTH = ('file name length', 56, 57)
     FILE_NAME_OFFSET = ('file name offset', 58,59)
     FILE_NAME = ('file name', 60, '+')
+    LAYOUT = StructLayout(UsnRecordBase.RECORD_LENGTH, UsnRecordBase.MAJOR_VERSION, UsnRecordBase.MINOR_VERSION,
+                          FILE_REFERENCE_NUMBER, PARENT_FILE_REFERENCE_NUMBER, USN, TIMESTAMP, REASON, SOURCE_INFO,
+                          SECURITY_ID, FILE_ATTRIBUTES, FILE_NAME_LENGTH, FILE_NAME_OFFSET)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    ####################################################################################################################
-    # Raw values
-
-    # First three fields are parsed in parent class.
-
-    @property
-    def file_reference_number_raw(self):
-        return self.data[8:16]
-
-    @property
-    def parent_file_reference_number_raw(self):
-        return self.data[16:24]
-
-    @property
-    def usn_raw(self):
-        return self.data[24:32]
-
-    @property
-    def timestamp_raw(self):
-        return self.data[32:40]
-
-    @property
-    def reason_raw(self):
-        return self.data[40:44]
-
-    @property
-    def source_info_raw(self):
-        return self.data[44:48]
-
-    @property
-    def security_id_raw(self):
-        return self.data[48:52]
-
-    @property
-    def file_attributes_raw(self):
-        return self.data[52:56]
-
-    @property
-    def file_name_length_raw(self):
-        return self.data[56:58]
-
-    @property
-    def file_name_offset_raw(self):
-        return self.data[58:60]
-
-    @property
-    def file_name_raw(self):
-        return self.data[self.file_name_offset : self.file_name_offset + self.file_name_length]
+    __slots__ = ()
 
     ####################################################################################################################
     # Interpreted values
@@ -459,19 +668,19 @@ class UsnRecordV2(UsnRecordBase):
 
     @property
     def parent_file_reference_mft_entry(self):
-        return reverse_hexlify_int(self.parent_file_reference_number_raw[0:6])
+        return self._parent_file_reference_number & 0xffffffffffff
 
     @property
     def parent_file_reference_sequence_number(self):
-        return reverse_hexlify_int(self.parent_file_reference_number_raw[6:8])
+        return self._parent_file_reference_number >> 48
 
     @property
     def file_reference_mft_entry(self):
-        return reverse_hexlify_int(self.file_reference_number_raw[0:6])
+        return self._file_reference_number & 0xffffffffffff
 
     @property
     def file_reference_sequence_number(self):
-        return reverse_hexlify_int(self.file_reference_number_raw[6:8])
+        return self._file_reference_number >> 48
 
     ####################################################################################################################
     # Printing
@@ -486,7 +695,8 @@ class UsnRecordV2(UsnRecordBase):
         ])
         return formatted
 
-    def formatted_csv_column_headers(self):
+    @classmethod
+    def formatted_csv_column_headers(cls):
         formatted = super().formatted_csv_column_headers()
         formatted.extend([
             'file reference mft entry',
@@ -533,58 +743,11 @@ class UsnRecordV3(UsnRecordBase):
     FILE_NAME_LENGTH = ('file name length', 72, 73)
     FILE_NAME_OFFSET = ('file name offset', 74, 75)
     FILE_NAME = ('file name', 76, '+')
+    LAYOUT = StructLayout(UsnRecordBase.RECORD_LENGTH, UsnRecordBase.MAJOR_VERSION, UsnRecordBase.MINOR_VERSION,
+                          FILE_REFERENCE_NUMBER, PARENT_FILE_REFERENCE_NUMBER, USN, TIMESTAMP, REASON, SOURCE_INFO,
+                          SECURITY_ID, FILE_ATTRIBUTES, FILE_NAME_LENGTH, FILE_NAME_OFFSET)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-    ####################################################################################################################
-    # Raw values
-
-    # First three fields are parsed in parent class.
-
-    @property
-    def file_reference_number_raw(self):
-        return self.data[8:24]
-
-    @property
-    def parent_file_reference_number_raw(self):
-        return self.data[24:40]
-
-    @property
-    def usn_raw(self):
-        return self.data[40:48]
-
-    @property
-    def timestamp_raw(self):
-        return self.data[48:56]
-
-    @property
-    def reason_raw(self):
-        return self.data[56:60]
-
-    @property
-    def source_info_raw(self):
-        return self.data[60:64]
-
-    @property
-    def security_id_raw(self):
-        return self.data[64:68]
-
-    @property
-    def file_attributes_raw(self):
-        return self.data[68:72]
-
-    @property
-    def file_name_length_raw(self):
-        return self.data[72:74]
-
-    @property
-    def file_name_offset_raw(self):
-        return self.data[74:76]
-
-    @property
-    def file_name_raw(self):
-        return self.data[self.file_name_offset:self.file_name_length]
+    __slots__ = ()
 
     ####################################################################################################################
     # Interpreted values
@@ -610,6 +773,8 @@ class UsnRecordV3(UsnRecordBase):
 
 
 class UsnRecordV4(UsnRecordBase):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         raise NotImplementedError("There's no information on V4 available yet.")
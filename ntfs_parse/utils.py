@@ -1,8 +1,18 @@
 from binascii import hexlify
 from datetime import datetime, timedelta
+import errno
+import os
+import stat
+import struct
 
 
 _FILETIME_ORIGIN = datetime(1601, 1, 1)
+# Size of the pieces copy_range copies in, so the memory it needs doesn't depend on the size of what is copied
+COPY_SIZE = 8 * 1024 * 1024
+# The update sequence number is written at the end of every 512 bytes, whatever the sector size of the disk
+FIXUP_STRIDE = 512
+# Errors that mean the kernel can't copy between these two files, copying through Python still works then
+_NO_KERNEL_COPY = (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF)
 
 
 def reverse(byte_string):
@@ -32,6 +42,69 @@ def filetime_to_datetime(byte_string):
     return _FILETIME_ORIGIN + timedelta(microseconds=int(hexlify(arr), 16) / 10)
 
 
+def filetime_int_to_datetime(filetime):
+    return _FILETIME_ORIGIN + timedelta(microseconds=filetime / 10)
+
+
+def datetime_to_filetime(date_time):
+    return (date_time - _FILETIME_ORIGIN) // timedelta(microseconds=1) * 10
+
+
+# All layouts by their fields, so FieldValues can find their class again when they are unpickled
+_LAYOUTS = {}
+
+
+def _unpickle_field_values(fields, values):
+    return _LAYOUTS[fields]._values_class(values)
+
+
+class FieldValues(tuple):
+    """Tuple with the decoded values of a record. It is indexed with the field tuples of its StructLayout, which keeps
+    the values as small as a plain tuple while reading like a dictionary."""
+    __slots__ = ()
+    fields = ()
+    index = {}
+
+    def __getitem__(self, field):
+        return tuple.__getitem__(self, self.index[field])
+
+    def __reduce__(self):
+        return _unpickle_field_values, (self.fields, tuple(self))
+
+
+class StructLayout():
+    """Compiles the ('name', start, end) field tuples of a record type into a single little endian struct.Struct.
+
+    unpack() decodes all fields of a record at once and returns them as FieldValues, indexed with the field tuples.
+    Fields of 1, 2, 4 or 8 bytes become unsigned integers, others are returned as bytes. Records that are shorter than
+    the layout are padded with zeroes, which gives the same values as reverse_hexlify_int on the truncated slices."""
+    _FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+    def __init__(self, *fields):
+        self.fields = tuple(sorted(fields, key=lambda field: field[1]))
+        struct_format = '<'
+        position = 0
+        for description, low, high in self.fields:
+            if low < position:
+                raise ValueError('Field %s overlaps with the previous field' % description)
+            if low > position:
+                struct_format += '%dx' % (low - position)
+            length = high - low + 1
+            struct_format += self._FORMATS.get(length, '%ds' % length)
+            position = high + 1
+        self.struct = struct.Struct(struct_format)
+        self.size = self.struct.size
+        index = {field: i for i, field in enumerate(self.fields)}
+        self._values_class = type('FieldValues', (FieldValues,), {'__slots__': (), 'fields': self.fields, 'index': index})
+        _LAYOUTS[self.fields] = self
+
+    def unpack(self, data, offset=0):
+        if len(data) - offset < self.size:
+            data = bytes(data[offset:offset + self.size]).ljust(self.size, b'\x00')
+            offset = 0
+        return self._values_class(self.struct.unpack_from(data, offset))
+
+
 def interpret(data):
     interpreted_data = ''
     for byte in range(len(data)):
@@ -51,3 +124,103 @@ def writeout_as_xxd(data, out):
         for i in range(0, len(data_line), 4):
             print_line += data_line[i:i+4] + ' '
         out.write('      %07x: %-40s %s\n' % (x, print_line, interpreted))
+
+
+# Fixups: NTFS writes the update sequence number over the last two bytes of every sector of an MFT entry or $LogFile
+# page, and keeps the original bytes in the update sequence array, right after the number. usa_offset is where the
+# number is, usa_count counts the number and the array entries together. The sector endings are read and written with
+# a stride, not one sector at a time.
+def _fixup_sectors(data, usa_offset, usa_count, stride):
+    """Number of sectors that can be fixed up: data and the array have to hold them"""
+    return max(0, min(usa_count - 1, len(data) // stride, (len(data) - usa_offset - 2) // 2))
+
+
+def fixup_mismatches(data, usa_offset, usa_count, stride=FIXUP_STRIDE):
+    """Numbers of the sectors that don't end in the update sequence number: torn writes, overwritten or missing
+    sectors. Empty when all is well."""
+    sectors = _fixup_sectors(data, usa_offset, usa_count, stride)
+    end = sectors * stride
+    number = bytes(data[usa_offset:usa_offset + 2])
+    first = data[stride - 2:end:stride]
+    second = data[stride - 1:end:stride]
+    mismatches = []
+    if first != number[:1] * sectors or second != number[1:] * sectors:
+        mismatches = [sector for sector in range(sectors) if first[sector] != number[0] or second[sector] != number[1]]
+    # Sectors that aren't there at all
+    mismatches.extend(range(sectors, max(usa_count - 1, sectors)))
+    return mismatches
+
+
+def replace_fixups(data, usa_offset, usa_count, stride=FIXUP_STRIDE):
+    """Puts the original sector endings back from the update sequence array. data is a bytearray, changed in place."""
+    sectors = _fixup_sectors(data, usa_offset, usa_count, stride)
+    end = sectors * stride
+    array = data[usa_offset + 2:usa_offset + 2 + 2 * sectors]
+    data[stride - 2:end:stride] = array[0::2]
+    data[stride - 1:end:stride] = array[1::2]
+
+
+def _is_regular_file(f):
+    try:
+        return stat.S_ISREG(os.fstat(f.fileno()).st_mode)
+    except (AttributeError, ValueError, OSError):
+        return False
+
+
+def _kernel_copy(in_fd, position, length, out_fd):
+    """Copies with copy_file_range, or sendfile when that isn't possible. Returns the number of bytes copied, which is
+    less than length when the input ends or when neither works."""
+    copy_functions = []
+    if hasattr(os, 'copy_file_range'):
+        copy_functions.append(lambda offset, count: os.copy_file_range(in_fd, out_fd, count, offset_src=offset))
+    if hasattr(os, 'sendfile'):
+        copy_functions.append(lambda offset, count: os.sendfile(out_fd, in_fd, offset, count))
+
+    copied = 0
+    for copy_function in copy_functions:
+        try:
+            while copied < length:
+                n_bytes = copy_function(position + copied, min(length - copied, COPY_SIZE))
+                if n_bytes == 0:
+                    return copied
+                copied += n_bytes
+            return copied
+        except OSError as e:
+            if e.errno not in _NO_KERNEL_COPY:
+                raise
+    return copied
+
+
+def copy_range(in_file, position, length, out_file):
+    """Copies length bytes from position in in_file to the current position of out_file, COPY_SIZE bytes at a time.
+    Between two regular files the kernel does the copying. Returns the number of bytes copied, which is less than
+    length when in_file ends before that."""
+    copied = 0
+    if _is_regular_file(in_file) and _is_regular_file(out_file):
+        out_file.flush()
+        copied = _kernel_copy(in_file.fileno(), position, length, out_file.fileno())
+        # The kernel moved the position of the file descriptor, let the file object catch up
+        out_file.seek(os.lseek(out_file.fileno(), 0, os.SEEK_CUR))
+        if copied == length:
+            return copied
+
+    in_file.seek(position + copied)
+    while copied < length:
+        chunk = in_file.read(min(length - copied, COPY_SIZE))
+        if not chunk:
+            break
+        out_file.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+def skip_range(length, out_file):
+    """Moves length bytes forward in out_file. In a regular file that leaves a hole (a sparse region) behind, that
+    reads back as zeroes. Pipes and the like get the zeroes written."""
+    if out_file.seekable():
+        out_file.seek(length, os.SEEK_CUR)
+        return
+    zeroes = bytes(min(length, COPY_SIZE))
+    while length > 0:
+        out_file.write(zeroes[:length])
+        length -= len(zeroes)
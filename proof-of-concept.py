@@ -39,7 +39,6 @@
 ########################################################################################################################
 
 from argparse import ArgumentParser
-from tempfile import NamedTemporaryFile
 import sys
 
 from ntfs_parse import BootSector, MFT, LogFile, UsnJrnl, AttributeTypeEnum
@@ -203,7 +202,16 @@ class Match:
 
 ########################################################################################################################
 # Combining algorithm function
-def combine_data(mft_entry_nr, seq_val_dict, all_log_file_transactions):
+def index_transactions_by_usn(all_log_file_transactions):
+    # Every USN that is found in a transaction, with the transactions it is found in (once per occurrence)
+    transactions_by_usn = {}
+    for transaction in all_log_file_transactions:
+        for lsn, usn in transaction.usns:
+            transactions_by_usn.setdefault(usn, []).append(transaction)
+    return transactions_by_usn
+
+
+def combine_data(mft_entry_nr, seq_val_dict, transactions_by_usn):
     # The basic, current, MFT entry information
     mft_entry_hist = MFTEntryHistory(mft.entries[mft_entry_nr])
     # For each entry in our $UsnJrnl items (grouped on sequence value)
@@ -211,18 +219,14 @@ def combine_data(mft_entry_nr, seq_val_dict, all_log_file_transactions):
         # Add a MFT history object to the history dict.
         mft_entry_hist.add_history(sequence_val, mft_seq_val_hist=MFTSequenceValueHistory(mft_entry_nr, sequence_val))
         # Filling the history dict with matching USN and $LogFile records
-        for usn_record in records:  # <<<--------------------+
-            for transaction in all_log_file_transactions:  # <<<------------------------+
-                if transaction.contains_usn:               # |                          |
-                    # some transactions contain multiple   # |                          |
-                    for usn in transaction.usns:           # |                          |
-                        # if the same then it's a match    # |                          |
-                        if usn[1] == usn_record.usn:       # |                          |
-                            # At this level we have:       # |                          |
-                            #  one of the USN records -> usn_record                     |
-                            #  the transaction corresponding with that USN record -> transaction
-                            # Add our USN record and the corresponding Transaction to our match list
-                            mft_entry_hist.history[sequence_val].match_list.append(Match(usn_record, transaction))
+        for usn_record in records:
+            # The transactions that contain the same USN are a match
+            for transaction in transactions_by_usn.get(usn_record.usn, ()):
+                # At this level we have:
+                #  one of the USN records -> usn_record
+                #  the transaction corresponding with that USN record -> transaction
+                # Add our USN record and the corresponding Transaction to our match list
+                mft_entry_hist.history[sequence_val].match_list.append(Match(usn_record, transaction))
     # return the list, otherwise the data_list variable is appended in obfuscation
     return mft_entry_hist
 
@@ -230,8 +234,6 @@ def combine_data(mft_entry_nr, seq_val_dict, all_log_file_transactions):
 # MAIN
 if __name__ == '__main__':
     args = parse_args(sys.argv[1:])
-    usnjrnl_file = NamedTemporaryFile()
-    logfile_file = NamedTemporaryFile()
 
     # Parse the MFT first
     sector = BootSector(image_name=args.image,
@@ -239,34 +241,22 @@ if __name__ == '__main__':
                         offset_bytes=args.offset_bytes,
                         sector_size=args.sector_size)
     mft = MFT(image_name=args.image, boot_sector=sector)
-    mft.parse_all()
-
-    # get the inum (MFT entry number) of the $UsnJrnl --> located in $Extend|$INDEX_ROOT attribute
-    usn_jrnl_inum = mft.entries[11].\
-        attributes[AttributeTypeEnum.INDEX_ROOT][0].\
-        entries[AttributeTypeEnum.FILE_NAME]['$UsnJrnl'].\
-        file_reference_mft_entry
+    # Only a handful of entries get their attributes looked at
+    mft.parse_all(lazy=True)
 
-    # carve out the logfile (inum 2) and store in local temporary file
-    mft.extract_data(inum=2, output_file=logfile_file.name, stream=0)
-    # carve out the $UsnJrnl (inum searched for above) and store in local temporary file
-    mft.extract_data(inum=usn_jrnl_inum, output_file=usnjrnl_file.name, stream=0)
-
-    # pass the temporary logfile-file into the $LogFile class and parse it
-    log_file = LogFile(dump_dir=args.dump_dir, file_name=logfile_file.name)
+    # parse the logfile (inum 2) straight from the image
+    log_file = LogFile.from_image(mft=mft, dump_dir=args.dump_dir)
     log_file.parse_all()
     log_file.connect_transactions()
 
-    # pass the temporary usnjrnl-file into the $UsnJrnl class and parse it
-    usn_jrnl = UsnJrnl(usnjrnl_file.name)
+    # parse the $UsnJrnl straight from the image, its inum is looked up in the $Extend|$INDEX_ROOT attribute
+    usn_jrnl = UsnJrnl.from_image(mft=mft)
     usn_jrnl.parse()
 
-    # close the temporary files as all the needed data is in the local variables usn_jrnl and log_file
-    usnjrnl_file.close()
-    logfile_file.close()
-
     # $UsnJrnl records ordered by MFT entry
     usnjrnl_grouped = usn_jrnl.grouped_by_entry
+    # $LogFile transactions by the USN's they contain, to match them with the $UsnJrnl records
+    transactions_by_usn = index_transactions_by_usn(log_file.transactions.values())
 
     # If no inum has been given as input go through all the available data,
     # else use the given inum to search for the inum related information
@@ -275,10 +265,10 @@ if __name__ == '__main__':
     if not args.inum:
         # For each entry in our $UsnJrnl items (grouped by MFT entry)
         for mft_entry, sequence_val_dict in sorted(usnjrnl_grouped.items()):
-            data_list.append(combine_data(mft_entry, sequence_val_dict, log_file.transactions.values()))
+            data_list.append(combine_data(mft_entry, sequence_val_dict, transactions_by_usn))
     else:
         if args.inum in usnjrnl_grouped.keys():
-            data_list.append(combine_data(args.inum, usnjrnl_grouped[args.inum], log_file.transactions.values()))
+            data_list.append(combine_data(args.inum, usnjrnl_grouped[args.inum], transactions_by_usn))
         else:
             print('No such MFT entry in $UsnJrnl')
             exit()
@@ -0,0 +1,130 @@
+import csv
+import io
+import os
+import random
+import struct
+
+import pytest
+
+from ntfs_parse import LogFile
+
+PAGE_SIZE = 4096
+SECTOR_SIZE = 512
+PAGE_HEADER_LENGTH = 64
+LSN_HEADER_LENGTH = 48
+# Operations whose data is not interpreted: (redo, undo)
+OPERATIONS = [(14, 15), (21, 22), (27, 1), (3, 2), (0, 1)]
+
+
+def lsn_record(lsn, previous_lsn, transaction_id, operations, data_length, split):
+    redo, undo = operations
+    redo_length = data_length // 2
+    body = struct.pack('<HHHHHHHHHHHHIIII', redo, undo, 40, redo_length, 40 + redo_length,
+                       data_length - redo_length, 0x18, 0, 0, 0x38, 0, 0, 0, 0, 0, 0)
+    body += bytes((lsn + k) % 251 for k in range(data_length))
+    header = struct.pack('<QQQIHHIIH6x', lsn, previous_lsn, previous_lsn, len(body), 0, 0, 1, transaction_id,
+                         1 if split else 0)
+    return header, body
+
+
+def apply_fixups(page, fixup_value):
+    struct.pack_into('<H', page, 40, fixup_value)
+    for sector in range(PAGE_SIZE // SECTOR_SIZE):
+        end = (sector + 1) * SECTOR_SIZE - 2
+        page[42 + 2 * sector:44 + 2 * sector] = page[end:end + 2]
+        struct.pack_into('<H', page, end, fixup_value)
+
+
+def rcrd_pages(page_count, seed):
+    """RCRD pages full of records of varying length, many of them split over two pages"""
+    rnd = random.Random(seed)
+    pages = []
+    page = bytearray(PAGE_SIZE)
+    pos = PAGE_HEADER_LENGTH
+    last_lsn = last_end_lsn = next_record_offset = 0
+    carry = b''
+    lsn = 0x10000
+    previous = {}
+
+    def close_page():
+        struct.pack_into('<4sHHQIHHH6xQ', page, 0, b'RCRD', 40, 9, last_lsn, 0, 1, 1, next_record_offset,
+                         last_end_lsn)
+        apply_fixups(page, 0x0300 + len(pages) + 1)
+        pages.append(bytes(page))
+
+    while len(pages) < page_count:
+        if carry:
+            page[pos:pos + len(carry)] = carry
+            pos += len(carry)
+            carry = b''
+        if pos + LSN_HEADER_LENGTH > PAGE_SIZE:
+            close_page()
+            page, pos = bytearray(PAGE_SIZE), PAGE_HEADER_LENGTH
+            continue
+        transaction_id = rnd.choice([0x18, 0x30, 0x48])
+        data_length = rnd.choice([8, 64, 400, 1200, 2400]) + 40
+        split = pos + LSN_HEADER_LENGTH + data_length > PAGE_SIZE
+        header, body = lsn_record(lsn, previous.get(transaction_id, 0), transaction_id,
+                                  rnd.choice(OPERATIONS), data_length - 40, split)
+        previous[transaction_id] = lsn
+        page[pos:pos + LSN_HEADER_LENGTH] = header
+        last_lsn, next_record_offset = lsn, pos
+        pos += LSN_HEADER_LENGTH
+        if split:
+            room = PAGE_SIZE - pos
+            page[pos:] = body[:room]
+            carry = body[room:]
+            close_page()
+            page, pos = bytearray(PAGE_SIZE), PAGE_HEADER_LENGTH
+        else:
+            page[pos:pos + len(body)] = body
+            pos += len(body)
+            last_end_lsn = lsn
+        lsn += (LSN_HEADER_LENGTH + len(body)) // 8
+    return pages
+
+
+def write_logfile(path, zero_pages):
+    """$LogFile with the restart and logging area and 40 RCRD pages. The pages in zero_pages are left zero, like the
+    unused part of a log."""
+    data = bytearray()
+    for copy in range(2):
+        page = bytearray(PAGE_SIZE)
+        struct.pack_into('<4sHHQIIHHHH', page, 0, b'RSTR', 30, 9, 0, PAGE_SIZE, PAGE_SIZE, 48, 1, 1, 0)
+        data += page
+    for copy in range(2):
+        page = bytearray(PAGE_SIZE)
+        struct.pack_into('<4sHHQIHHH', page, 0, b'RCRD', 40, 9, 0, 0, 1, 1, PAGE_HEADER_LENGTH)
+        data += page
+    for nr, page in enumerate(rcrd_pages(40, seed=7)):
+        data += bytes(PAGE_SIZE) if nr in zero_pages else page
+    path.write_bytes(bytes(data))
+    return str(path)
+
+
+def parse(file_name, dump_dir, workers):
+    """The parsed pages, the csv rows, the transactions and the names of the dumped pages"""
+    log_file = LogFile(dump_dir=dump_dir, file_name=file_name)
+    log_file.parse_all(workers=workers)
+    log_file.connect_transactions()
+    parsed = io.StringIO()
+    for page in log_file.rcrd_records:
+        page.writeout_all(parsed)
+    rows = io.StringIO()
+    log_file.writeout_csv(csv.writer(rows))
+    transactions = io.StringIO()
+    log_file.writeout_transactions(csv.writer(transactions))
+    return parsed.getvalue(), rows.getvalue(), transactions.getvalue(), sorted(os.listdir(dump_dir))
+
+
+@pytest.mark.parametrize('chunk_pages', [1, 2, 5])
+@pytest.mark.parametrize('zero_pages', [(), (6, 7, 20)], ids=['no_gaps', 'zero_gaps'])
+def test_parallel_parse_matches_sequential(tmp_path, monkeypatch, chunk_pages, zero_pages):
+    # Chunks of a few pages, so the records split over two pages straddle the chunk edges
+    monkeypatch.setattr(LogFile, 'CHUNK_PAGES', chunk_pages)
+    file_name = write_logfile(tmp_path / 'LogFile', zero_pages)
+    expected = parse(file_name, str(tmp_path / 'sequential'), workers=1)
+    assert expected[1].count('\n') > 100
+    # Records split over two pages are parsed from the page they end on
+    assert 'LEFTOVER' in expected[0]
+    assert parse(file_name, str(tmp_path / 'parallel'), workers=3) == expected
@@ -0,0 +1,54 @@
+import struct
+
+import pytest
+
+from ntfs_parse import UsnJrnl
+
+
+def usn_record(usn, name_data, inum, reason):
+    length = (60 + len(name_data) + 7) & ~7
+    data = bytearray(length)
+    struct.pack_into('<IHHQQQQIIIIHH', data, 0, length, 2, 0, inum | (1 << 48), 5 | (1 << 48), usn,
+                     131000000000000000 + usn, reason, 0, 0, 0x20, len(name_data), 60)
+    data[60:60 + len(name_data)] = name_data
+    return bytes(data)
+
+
+def decoy_name():
+    """A name with what looks like a 64 byte record in it, at the first record boundary in the name. A chunk that
+    starts in its record resyncs on it."""
+    decoy = bytearray(60)
+    struct.pack_into('<IH', decoy, 0, 64, 2)
+    struct.pack_into('<HH', decoy, 56, 0, 60)
+    return b'd\x00e\x00' + bytes(decoy)
+
+
+def write_journal(path, gaps):
+    """$J with records of varying length. gaps maps a record number to the number of zeroes written before it."""
+    data = bytearray()
+    for k in range(300):
+        data += b'\x00' * gaps.get(k, 0)
+        if k % 10 == 3:
+            name_data = decoy_name()
+        else:
+            name_data = ('file%d%s.txt' % (k, 'x' * (k % 7))).encode('utf-16-le')
+        data += usn_record(len(data), name_data, 30 + k % 11, 1 << (k % 16))
+    path.write_bytes(bytes(data))
+    return str(path)
+
+
+def parse(file_name, workers):
+    usn_jrnl = UsnJrnl(file=file_name)
+    usn_jrnl.parse(workers=workers)
+    return [(record.offset_bytes, record.formatted_csv()) for record in usn_jrnl.records]
+
+
+@pytest.mark.parametrize('chunk_size', [64, 200, 1024])
+@pytest.mark.parametrize('gaps', [{}, {40: 8, 41: 512, 150: 4096, 299: 24}], ids=['no_gaps', 'zero_gaps'])
+def test_parallel_parse_matches_sequential(tmp_path, monkeypatch, chunk_size, gaps):
+    # Chunks much smaller than the journal, so records straddle the chunk edges
+    monkeypatch.setattr(UsnJrnl, 'CHUNK_SIZE', chunk_size)
+    file_name = write_journal(tmp_path / 'J', gaps)
+    expected = parse(file_name, workers=1)
+    assert len(expected) == 300
+    assert parse(file_name, workers=3) == expected
@@ -4,13 +4,34 @@ from argparse import ArgumentParser
 from time import process_time
 import sys
 
-from ntfs_parse import UsnJrnl
+from ntfs_parse import UsnJrnl, UsnCheckpoint, UsnMax
+from ntfs_parse import BootSector
 
 def parse_args(argument_string):
     parser = ArgumentParser()
-    parser.add_argument('-f',
-                        help='File containing the UsnJrnl',
-                        dest='file')
+    input_group = parser.add_mutually_exclusive_group()
+    input_group.add_argument('-f',
+                             help='File containing the UsnJrnl',
+                             dest='file')
+    input_group.add_argument('-i',
+                             help='raw image file, the UsnJrnl is read from it directly',
+                             dest='image')
+
+    # group of offset parameters, for reading straight from an image
+    o_group = parser.add_mutually_exclusive_group()
+    o_group.add_argument('-o',
+                         help='Offset into the image for the filesystem, in sectors',
+                         dest='offset_sectors',
+                         type=int)
+    o_group.add_argument('-O',
+                         help='Offset into the image for the filesystem, in bytes',
+                         dest='offset_bytes',
+                         type=int)
+    parser.add_argument('-s',
+                        help='sector size (default=%(default)s)',
+                        default=512,
+                        type=int,
+                        dest='sector_size')
 
     parser.add_argument('-e',
                         help='Output file',
@@ -20,12 +41,52 @@ def parse_args(argument_string):
                         help='Number of records to parse. If left out, all will be parsed.',
                         dest='number',
                         type=int)
+    parser.add_argument('-w',
+                        help='Number of worker processes that parse the UsnJrnl. Default=1',
+                        dest='workers',
+                        type=int)
+    parser.add_argument('-m',
+                        help='File containing the $Max stream of the UsnJrnl, to recognize the journal in a checkpoint',
+                        dest='max_file')
+    parser.add_argument('--since-checkpoint',
+                        help='Checkpoint file. Only records after the checkpoint are parsed, after which it is updated. '
+                             'A missing or outdated checkpoint gives a full parse.',
+                        dest='checkpoint')
+    parser.add_argument('--store',
+                        help='Directory to keep the records in on disk instead of in memory, for very large journals',
+                        dest='store')
 
     return parser.parse_args(argument_string)
 
 if __name__ == '__main__':
     args = parse_args(sys.argv[1:])
 
-    usn_jrnl = UsnJrnl(args.file)
-    usn_jrnl.parse(number=args.number)
-    usn_jrnl.export_csv(args.output)
+    store = None
+    if args.store:
+        # Needs NumPy
+        from ntfs_parse.usn_jrnl.store import UsnRecordStore
+        store = UsnRecordStore(args.store)
+
+    if args.image:
+        sector = BootSector(image_name=args.image,
+                            offset_sectors=args.offset_sectors,
+                            offset_bytes=args.offset_bytes,
+                            sector_size=args.sector_size)
+        usn_jrnl = UsnJrnl.from_image(image_name=args.image, boot_sector=sector, store=store)
+    else:
+        usn_max = None
+        if args.max_file:
+            with open(args.max_file, 'rb') as f:
+                usn_max = UsnMax(f.read())
+        usn_jrnl = UsnJrnl(args.file, store=store, usn_max=usn_max)
+
+    checkpoint = UsnCheckpoint.load(args.checkpoint) if args.checkpoint else None
+    usn_jrnl.parse(number=args.number, workers=args.workers, checkpoint=checkpoint)
+    # With a checkpoint there is always an output file, also when there are no new records
+    usn_jrnl.export_csv(args.output, header=bool(args.checkpoint))
+    if args.checkpoint:
+        new_checkpoint = usn_jrnl.checkpoint(previous=checkpoint if usn_jrnl.resumed else None)
+        if new_checkpoint:
+            new_checkpoint.save(args.checkpoint)
+    if store is not None:
+        store.close()